@@ -0,0 +1,178 @@
+import time
+
+import numpy as np
+
+from bitboard import ROW_COUNT, COLUMN_COUNT
+from heuristics import AIHeuristics
+from transposition import (
+    TranspositionTable, position_key, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+)
+
+MOVE_ORDER = sorted(range(COLUMN_COUNT), key=lambda c: abs(c - COLUMN_COUNT // 2))
+WIN_SCORE = 1000000
+TIME_CHECK_INTERVAL = 256
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class NegamaxAI:
+    def __init__(self, time_budget_ms=500, max_depth=ROW_COUNT * COLUMN_COUNT,
+                 transposition_table=None):
+        self.time_budget_ms = time_budget_ms
+        self.max_depth = max_depth
+        self.transposition_table = transposition_table or TranspositionTable()
+        self.nodes = 0
+        self.next_time_check = 0
+        self.deadline = 0
+        self.generation = 0
+
+    def choose_move(self, position, piece):
+        start = time.perf_counter()
+        self.deadline = start + self.time_budget_ms / 1000
+        self.nodes = 0
+        self.next_time_check = TIME_CHECK_INTERVAL
+        self.generation = self.transposition_table.new_search()
+
+        position = position.copy()
+        valid = [c for c in MOVE_ORDER if position.can_play(c)]
+        best_move, best_score, depth_reached = valid[0], 0, 0
+        remaining = ROW_COUNT * COLUMN_COUNT - len(position.moves)
+
+        for depth in range(1, min(self.max_depth, remaining) + 1):
+            try:
+                move, score = self.search_root(position, piece, depth, best_move)
+            except SearchTimeout:
+                break
+            best_move, best_score, depth_reached = move, score, depth
+            if abs(score) >= WIN_SCORE - ROW_COUNT * COLUMN_COUNT:
+                break
+
+        elapsed = time.perf_counter() - start
+        return best_move, {
+            'column': best_move,
+            'score': best_score,
+            'depth': depth_reached,
+            'nodes': self.nodes,
+            'elapsed_ms': elapsed * 1000,
+            'nodes_per_sec': self.nodes / elapsed if elapsed > 0 else 0,
+        }
+
+    def search_root(self, position, piece, depth, first_move):
+        order = [first_move] + [c for c in MOVE_ORDER if c != first_move]
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_move, best_score = None, -WIN_SCORE - 1
+        for col in order:
+            if not position.can_play(col):
+                continue
+            position.play(col, piece)
+            try:
+                if position.is_win(piece):
+                    score = WIN_SCORE - len(position.moves)
+                else:
+                    score = -self.negamax(position, depth - 1, -beta, -alpha, 3 - piece)
+            finally:
+                position.undo()
+            if score > best_score:
+                best_move, best_score = col, score
+            alpha = max(alpha, score)
+        return best_move, best_score
+
+    def negamax(self, position, depth, alpha, beta, piece):
+        self.nodes += 1
+        if self.nodes >= self.next_time_check:
+            self.next_time_check = self.nodes + TIME_CHECK_INTERVAL
+            if time.perf_counter() > self.deadline:
+                raise SearchTimeout()
+
+        valid = [c for c in MOVE_ORDER if position.can_play(c)]
+        if not valid:
+            return 0
+
+        for col in valid:
+            position.play(col, piece)
+            won = position.is_win(piece)
+            position.undo()
+            if won:
+                return WIN_SCORE - len(position.moves) - 1
+
+        if depth == 0:
+            return self.evaluate(position, piece)
+
+        table = self.transposition_table
+        key = position_key(position)
+        entry = table.probe(key)
+        if entry is not None:
+            score, entry_depth, flag, move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER_BOUND and score > alpha:
+                    alpha = score
+                elif flag == UPPER_BOUND and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    return score
+            if move != NO_MOVE and move in valid:
+                valid.remove(move)
+                valid.insert(0, move)
+
+        if depth == 1:
+            best = self.evaluate_children(position, valid, piece)
+            table.store(key, best, depth, EXACT, generation=self.generation)
+            return best
+
+        alpha_start = alpha
+        best, best_move = -WIN_SCORE - 1, NO_MOVE
+        for col in valid:
+            position.play(col, piece)
+            try:
+                score = -self.negamax(position, depth - 1, -beta, -alpha, 3 - piece)
+            finally:
+                position.undo()
+            if score > best:
+                best, best_move = score, col
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best <= alpha_start:
+            flag = UPPER_BOUND
+        elif best >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        table.store(key, best, depth, flag, best_move, self.generation)
+        return best
+
+    def evaluate(self, position, piece):
+        board = position.to_array()
+        return (AIHeuristics.evaluate_position(board, piece)
+                - AIHeuristics.evaluate_position(board, 3 - piece))
+
+    def evaluate_children(self, position, valid, piece):
+        # Every child of a depth-1 node is a leaf. Scored as negamax(child, 0)
+        # would: a full board is a draw and a child where the opponent can
+        # win at once is that loss. The remaining children are scored with
+        # a single batched heuristic call instead of one call per child.
+        self.nodes += len(valid)
+        scores, leaves = [], []
+        for col in valid:
+            position.play(col, piece)
+            if position.is_full():
+                scores.append(0)
+            elif position.can_win_next(3 - piece):
+                scores.append(-(WIN_SCORE - len(position.moves) - 1))
+            else:
+                leaves.append(col)
+            position.undo()
+        if leaves:
+            boards = np.repeat(position.to_array()[np.newaxis], len(leaves), axis=0)
+            for i, col in enumerate(leaves):
+                boards[i, position.heights[col], col] = piece
+            heuristic = (AIHeuristics.evaluate_positions(boards, piece)
+                         - AIHeuristics.evaluate_positions(boards, 3 - piece))
+            scores.append(int(heuristic.max()))
+        return max(scores)
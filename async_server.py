@@ -0,0 +1,151 @@
+import asyncio
+import collections
+import logging
+
+from connections import MAX_QUEUED_FRAMES, CONNECTED_SOCKETS, BYTES_IN, BYTES_OUT
+from matchmaking import TICK_INTERVAL
+from protocol import decode_message, read_frame, negotiate_codec, HEADER, PICKLE_CODEC
+from server import ConnectFourServer
+
+log = logging.getLogger('connect4.server')
+
+
+class AsyncClient:
+    def __init__(self, writer, codec=PICKLE_CODEC, deltas=False, max_queued=MAX_QUEUED_FRAMES):
+        self.writer = writer
+        self.codec = codec
+        self.deltas = deltas
+        self.max_queued = max_queued
+        self.queue = collections.deque()
+        self.ready = asyncio.Event()
+        self.needs_resync = False
+        self.resync_source = None
+        self.closed = False
+        self.dropped = 0
+        self.task = asyncio.create_task(self.write_loop())
+
+    def sendall(self, data):
+        if self.closed or self.writer.is_closing():
+            raise ConnectionResetError("client connection is closed")
+        if len(self.queue) >= self.max_queued and self.resync_source is not None:
+            self.queue.clear()
+            self.needs_resync = True
+            self.dropped += 1
+        else:
+            self.queue.append(data)
+        self.ready.set()
+
+    async def write_loop(self):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                if self.closed and not self.queue:
+                    return
+                resync, self.needs_resync = self.needs_resync, False
+                batch = list(self.queue)
+                self.queue.clear()
+                if resync:
+                    batch = [self.resync_source()]
+                data = b''.join(batch)
+                self.writer.write(data)
+                await self.writer.drain()
+                BYTES_OUT.inc(len(data))
+        except (ConnectionError, OSError):
+            self.closed = True
+
+    def abort(self):
+        # Closing the transport also ends the read loop for this connection.
+        self.closed = True
+        self.queue.clear()
+        self.ready.set()
+        self.writer.close()
+
+    async def close(self, timeout=1.0):
+        self.closed = True
+        self.ready.set()
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class AsyncConnectFourServer(ConnectFourServer):
+    # Every room is only ever touched from the event loop thread, so the room
+    # locks are never contended. AI searches run in the default executor on
+    # a copy of the board and are applied back on the loop.
+
+    def start(self, host, port):
+        self.host = host
+        self.port = port
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024)
+        print(f"Enhanced Server (asyncio) started, listening on {self.host}:{self.port}")
+        if self.metrics_port is None:
+            asyncio.create_task(self.analytics_task())
+        asyncio.create_task(self.matchmaking_task())
+        async with server:
+            await server.serve_forever()
+
+    async def analytics_task(self):
+        while True:
+            await asyncio.sleep(30)
+            self.print_analytics()
+
+    async def matchmaking_task(self):
+        while True:
+            await asyncio.sleep(TICK_INTERVAL)
+            self.rooms.tick()
+
+    async def handle_connection(self, reader, writer):
+        CONNECTED_SOCKETS.inc()
+        client, ticket = None, None
+        try:
+            frame = await read_frame(reader)
+            BYTES_IN.inc(HEADER.size + len(frame))
+            join = decode_message(frame)
+            client = AsyncClient(writer, negotiate_codec(join.get('codecs')), bool(join.get('deltas')))
+            ticket = self.attach(client, join)
+        except Exception as e:
+            log.warning("Error joining client: %s", e)
+
+        while ticket is not None:
+            try:
+                frame = await read_frame(reader)
+                BYTES_IN.inc(HEADER.size + len(frame))
+                message = decode_message(frame)
+                self.route(ticket, message)
+                room = ticket.room
+                if room is not None and room.ai is not None and not ticket.spectator:
+                    await self.play_ai_turn(room)
+
+            except asyncio.IncompleteReadError:
+                break
+            except Exception as e:
+                log.warning("Error handling client %s: %s", ticket.player_number, e)
+                break
+
+        if ticket is not None:
+            self.detach(ticket)
+        if client is not None:
+            await client.close()
+        writer.close()
+        CONNECTED_SOCKETS.dec()
+
+    async def play_ai_turn(self, room):
+        # The search runs without the room lock, so at most one per room.
+        if room.ai_searching or not room.ai_to_move():
+            return
+        room.ai_searching = True
+        try:
+            board, game_id = room.board.copy(), room.game_id
+            col = await asyncio.get_running_loop().run_in_executor(None, room.choose_ai_move, board)
+        finally:
+            room.ai_searching = False
+        if room.game_id == game_id and room.ai_to_move() and not room.closed:
+            room.process_move(room.ai_player, col)
+            room.flush()
@@ -0,0 +1,150 @@
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+# The client draw cases render into an off-screen surface.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from bitboard import Position
+from heuristics import AIHeuristics
+from protocol import encode_message, decode_message, PICKLE_CODEC, BINARY_CODEC
+from rooms import GameRoom
+from server import GameAnalytics
+from client import ConnectFourClient
+from benchmarks.wire_benchmark import sample_position, sample_messages
+
+REPEAT = 5
+THRESHOLD = 0.25
+# A 12 move game without a win, replayed by the process_move case.
+GAME_MOVES = [3, 3, 2, 4, 4, 2, 5, 1, 1, 6, 0, 3]
+
+
+class NullClient:
+    def __init__(self, codec=BINARY_CODEC, deltas=True):
+        self.codec = codec
+        self.deltas = deltas
+        self.resync_source = None
+
+    def sendall(self, data):
+        pass
+
+
+def make_room():
+    room = GameRoom(1, GameAnalytics(), iter(range(1, 1 << 30)))
+    room.add_player(NullClient())
+    room.add_player(NullClient(PICKLE_CODEC, deltas=False))
+    room.start_game()
+    return room
+
+
+def play_game(room):
+    room.board = Position()
+    room.turn = 0
+    room.game_over = False
+    room.move_history = []
+    for col in GAME_MOVES:
+        room.process_move(room.turn, col)
+
+
+def make_client():
+    client = ConnectFourClient.__new__(ConnectFourClient)
+    client.player_number = 0
+    client.init_state()
+    client.init_display()
+    client.board = sample_position().to_array()
+    client.visual_board = client.board.copy()
+    client.turn = 1
+    return client
+
+
+def cases():
+    # name -> (function, operations per call)
+    position = sample_position()
+    room = make_room()
+    room.board = position.copy()
+    update = sample_messages()['game_update']
+    pickled = encode_message(update, PICKLE_CODEC)[4:]
+    game_room = make_room()
+    client = make_client()
+    surface = client.display_surface
+    return {
+        'room.winning_move': (lambda: room.winning_move(1), 1),
+        'room.get_next_open_row': (lambda: room.get_next_open_row(3), 1),
+        'heuristics.evaluate_position': (lambda: AIHeuristics.evaluate_position(position, 1), 1),
+        'protocol.pickle_encode_game_update': (lambda: encode_message(update, PICKLE_CODEC), 1),
+        'protocol.pickle_decode_game_update': (lambda: decode_message(pickled), 1),
+        'room.process_move': (lambda: play_game(game_room), len(GAME_MOVES)),
+        'client.draw_board': (lambda: client.draw_board(surface), 1),
+        'client.draw_status_area': (lambda: client.draw_status_area(surface), 1),
+    }
+
+
+def measure(function, ops, repeat=REPEAT, min_time=0.2):
+    # Enough calls per repeat to run for about min_time, best of repeat.
+    number, elapsed = 1, 0
+    while elapsed < min_time / 10:
+        number *= 2
+        elapsed = timeit.timeit(function, number=number)
+    number = max(1, int(number * (min_time / elapsed)))
+    best = min(timeit.repeat(function, number=number, repeat=repeat))
+    return best / (number * ops) * 1e6
+
+
+def run(selected=None, repeat=REPEAT):
+    results = {}
+    for name, (function, ops) in cases().items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = {'us_per_op': measure(function, ops, repeat)}
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cases': results,
+    }
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # Returns the names of cases slower than baseline by more than threshold.
+    regressions = []
+    print(f"{'case':<40}{'us/op':>12}{'baseline':>12}{'change':>10}")
+    for name, result in results['cases'].items():
+        previous = baseline['cases'].get(name)
+        if previous is None:
+            print(f"{name:<40}{result['us_per_op']:>12.3f}{'-':>12}{'new':>10}")
+            continue
+        change = result['us_per_op'] / previous['us_per_op'] - 1
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{name:<40}{result['us_per_op']:>12.3f}{previous['us_per_op']:>12.3f}{change:>+10.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark engine, protocol and rendering hot paths')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    parser.add_argument('--baseline', default=None, help='Compare against results saved with --json')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Fail when a case is this much slower than the baseline (0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='Timing repeats per case (best is kept)')
+    parser.add_argument('cases', nargs='*', help='Only run cases whose name contains one of these')
+    args = parser.parse_args()
+
+    results = run(args.cases, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        print(json.dumps(results, indent=2))
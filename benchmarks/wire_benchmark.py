@@ -0,0 +1,54 @@
+import timeit
+
+from bitboard import Position
+from protocol import encode_message, decode_message, FrameReader, PICKLE_CODEC, BINARY_CODEC
+
+ITERATIONS = 20000
+
+
+def sample_position():
+    position = Position()
+    for i, col in enumerate([3, 3, 2, 4, 4, 2, 5, 1, 1, 6, 0, 3]):
+        position.play(col, i % 2 + 1)
+    return position
+
+
+def sample_messages():
+    position = sample_position()
+    return {
+        'game_start': {'type': 'game_start', 'board': Position(), 'turn': 0,
+                       'game_over': False, 'game_id': 1234},
+        'game_update': {'type': 'game_update', 'board': position, 'turn': 1, 'game_over': False,
+                        'result': None, 'winner': None, 'winning_cells': []},
+        'game_update_win': {'type': 'game_update', 'board': position, 'turn': 0, 'game_over': True,
+                            'result': 'win', 'winner': 0, 'winning_cells': [(0, 2), (1, 3), (2, 4), (3, 5)]},
+        'move': {'type': 'move', 'column': 3},
+    }
+
+
+def measure(message, codec, iterations=ITERATIONS):
+    frame = encode_message(message, codec)
+    payload = frame[4:]
+    encode_us = timeit.timeit(lambda: encode_message(message, codec), number=iterations) / iterations * 1e6
+    decode_us = timeit.timeit(lambda: decode_message(payload), number=iterations) / iterations * 1e6
+    return len(frame), encode_us, decode_us
+
+
+def run(iterations=ITERATIONS):
+    results = {}
+    for name, message in sample_messages().items():
+        for codec in (PICKLE_CODEC, BINARY_CODEC):
+            results[(name, codec)] = measure(message, codec, iterations)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare pickle and binary wire formats')
+    parser.add_argument('--iterations', type=int, default=ITERATIONS, help='Timing iterations per case')
+    args = parser.parse_args()
+
+    print(f"{'message':<18}{'codec':<12}{'bytes':>7}{'encode us':>12}{'decode us':>12}")
+    for (name, codec), (size, encode_us, decode_us) in run(args.iterations).items():
+        print(f"{name:<18}{codec:<12}{size:>7}{encode_us:>12.2f}{decode_us:>12.2f}")
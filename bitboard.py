@@ -0,0 +1,128 @@
+import numpy as np
+
+ROW_COUNT = 6
+COLUMN_COUNT = 7
+
+# Column-major layout: each column uses ROW_COUNT bits plus one sentinel bit
+# on top, so shifted masks never bleed from one column into the next.
+# Bit index of (row, col) is col * COLUMN_HEIGHT + row, row 0 at the bottom.
+COLUMN_HEIGHT = ROW_COUNT + 1
+BOTTOM_MASK = sum(1 << (c * COLUMN_HEIGHT) for c in range(COLUMN_COUNT))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROW_COUNT) - 1)
+WIN_SHIFTS = (1, COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1)
+LINE_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+
+def cell_bit(row, col):
+    return 1 << (col * COLUMN_HEIGHT + row)
+
+
+def has_four(mask):
+    for shift in WIN_SHIFTS:
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+class Position:
+    __slots__ = ('masks', 'heights', 'moves')
+
+    def __init__(self):
+        self.masks = [0, 0]
+        self.heights = [0] * COLUMN_COUNT
+        self.moves = []
+
+    def copy(self):
+        position = Position()
+        position.masks = self.masks[:]
+        position.heights = self.heights[:]
+        position.moves = self.moves[:]
+        return position
+
+    def can_play(self, col):
+        return self.heights[col] < ROW_COUNT
+
+    def next_open_row(self, col):
+        row = self.heights[col]
+        return row if row < ROW_COUNT else None
+
+    def play(self, col, piece):
+        row = self.heights[col]
+        self.masks[piece - 1] |= 1 << (col * COLUMN_HEIGHT + row)
+        self.heights[col] = row + 1
+        self.moves.append(col)
+        return row
+
+    def undo(self):
+        col = self.moves.pop()
+        row = self.heights[col] - 1
+        self.heights[col] = row
+        bit = 1 << (col * COLUMN_HEIGHT + row)
+        if self.masks[0] & bit:
+            self.masks[0] ^= bit
+        else:
+            self.masks[1] ^= bit
+        return col, row
+
+    def is_win(self, piece):
+        return has_four(self.masks[piece - 1])
+
+    def can_win_next(self, piece):
+        mask = self.masks[piece - 1]
+        for col, row in enumerate(self.heights):
+            if row < ROW_COUNT and has_four(mask | (1 << (col * COLUMN_HEIGHT + row))):
+                return True
+        return False
+
+    def winning_cells(self, row, col):
+        # Only the lines through (row, col) can have been completed by the
+        # piece just dropped there, so walk outwards from it in each direction.
+        piece = self.get(row, col)
+        if piece == 0:
+            return []
+        mask = self.masks[piece - 1]
+        for dr, dc in LINE_DIRECTIONS:
+            cells = [(row, col)]
+            for step in (1, -1):
+                r, c = row + dr * step, col + dc * step
+                while (0 <= r < ROW_COUNT and 0 <= c < COLUMN_COUNT
+                       and mask & (1 << (c * COLUMN_HEIGHT + r))):
+                    cells.append((r, c))
+                    r += dr * step
+                    c += dc * step
+            if len(cells) >= 4:
+                return sorted(cells, key=lambda cell: (cell[1], cell[0]))
+        return []
+
+    def is_full(self):
+        return (self.masks[0] | self.masks[1]) == BOARD_MASK
+
+    def valid_columns(self):
+        return [c for c in range(COLUMN_COUNT) if self.heights[c] < ROW_COUNT]
+
+    def get(self, row, col):
+        bit = 1 << (col * COLUMN_HEIGHT + row)
+        if self.masks[0] & bit:
+            return 1
+        if self.masks[1] & bit:
+            return 2
+        return 0
+
+    def tolist(self):
+        return [[self.get(r, c) for c in range(COLUMN_COUNT)] for r in range(ROW_COUNT)]
+
+    def to_array(self):
+        return np.array(self.tolist(), dtype=np.int8)
+
+    @classmethod
+    def from_array(cls, board):
+        position = cls()
+        for c in range(COLUMN_COUNT):
+            for r in range(ROW_COUNT):
+                piece = int(board[r][c])
+                if piece == 0:
+                    break
+                position.masks[piece - 1] |= cell_bit(r, c)
+                position.heights[c] = r + 1
+        return position
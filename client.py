@@ -8,7 +8,9 @@ import time
 import math
 import argparse
 import random
+from collections import OrderedDict
 from pygame.locals import *
+from protocol import FrameReader, encode_message, SUPPORTED_CODECS, PICKLE_CODEC
 
 ROW_COUNT = 6
 COLUMN_COUNT = 7
@@ -25,6 +27,25 @@ GREEN = (0, 255, 0)
 GRAY = (128, 128, 128)
 PURPLE = (128, 0, 128)
 ORANGE = (255, 165, 0)
+RECONNECT_ATTEMPTS = 10
+RECONNECT_DELAY = 2
+# Piece sprites are square, centered, with room for shadows and glow.
+SPRITE_HALF = RADIUS + 4
+SPRITE_COLORKEY = (255, 0, 255)
+HOVER_PULSE_LEVELS = 16
+TEXT_CACHE_SIZE = 64
+FPS = 60
+# With nothing moving, run_game sleeps until input or a server message,
+# waking every IDLE_REFRESH_MS to keep the metrics clock current.
+IDLE_REFRESH_MS = 100
+IDLE_WAIT_MS = 1000
+SERVER_EVENT = pygame.USEREVENT
+SCREEN_RECT = pygame.Rect(0, 0, WIDTH, HEIGHT + 150)
+STATUS_RECT = pygame.Rect(0, 0, WIDTH, SQUARE_SIZE)
+BOARD_RECT = pygame.Rect(0, SQUARE_SIZE, WIDTH, HEIGHT - 50 - SQUARE_SIZE)
+PLAY_RECT = pygame.Rect(0, 0, WIDTH, HEIGHT - 50)
+BUTTONS_RECT = pygame.Rect(0, HEIGHT - 50, WIDTH, 50)
+METRICS_RECT = pygame.Rect(0, HEIGHT, WIDTH, 150)
 
 
 class Circle:
@@ -167,32 +188,133 @@ class FallingPiece:
                 return False
         return self.active
 
-    def draw(self, surface):
-        center_x = int(self.x)
-        center_y = int(self.y)
-        pygame.draw.circle(surface, (50, 50, 50), (center_x + 2, center_y + 2), RADIUS)
-        glow_radius = RADIUS + 3
-        glow_color = tuple(min(255, c + 30) for c in self.color)
-        pygame.draw.circle(surface, glow_color, (center_x, center_y), glow_radius)
-        pygame.draw.circle(surface, self.color, (center_x, center_y), RADIUS)
-        highlight_color = tuple(min(255, c + 80) for c in self.color)
+    def rect(self):
+        return pygame.Rect(
+            int(self.x) - SPRITE_HALF,
+            int(self.y) - SPRITE_HALF,
+            SPRITE_HALF * 2,
+            SPRITE_HALF * 2,
+        )
+
+    def draw(self, surface, sprites):
+        surface.blit(
+            sprites.falling[self.color],
+            (int(self.x) - SPRITE_HALF, int(self.y) - SPRITE_HALF),
+        )
+
+
+class PieceSprites:
+    # Every piece style is drawn once into its own surface, so drawing a
+    # piece in a frame is a single blit. Pieces have no partial
+    # transparency, so an RLE colorkey is used instead of per-pixel alpha,
+    # which blits several times faster. Hover pieces are kept at
+    # HOVER_PULSE_LEVELS brightness steps between 0.7 and 1.0.
+    def __init__(self, colors=(RED, YELLOW), pulse_levels=HOVER_PULSE_LEVELS):
+        self.pulse_levels = pulse_levels
+        self.static = {color: self.render_static(color) for color in colors}
+        self.falling = {color: self.render_falling(color) for color in colors}
+        self.hover = {
+            color: [
+                self.render_hover(color, 0.7 + 0.3 * level / (pulse_levels - 1))
+                for level in range(pulse_levels)
+            ]
+            for color in colors
+        }
+
+    def new_sprite(self):
+        sprite = pygame.Surface((SPRITE_HALF * 2, SPRITE_HALF * 2)).convert()
+        sprite.fill(SPRITE_COLORKEY)
+        sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+        return sprite
+
+    def render_static(self, color):
+        sprite, center = self.new_sprite(), SPRITE_HALF
+        highlight = tuple(min(255, c + 80) for c in color)
+        shadow = tuple(max(0, c - 80) for c in color)
+        pygame.draw.circle(sprite, shadow, (center + 3, center + 3), RADIUS)
+        pygame.draw.circle(sprite, color, (center, center), RADIUS)
+        pygame.draw.circle(sprite, highlight, (center - 5, center - 5), RADIUS // 3)
+        return sprite
+
+    def render_falling(self, color):
+        sprite, center = self.new_sprite(), SPRITE_HALF
+        glow_color = tuple(min(255, c + 30) for c in color)
+        highlight_color = tuple(min(255, c + 80) for c in color)
+        pygame.draw.circle(sprite, (50, 50, 50), (center + 2, center + 2), RADIUS)
+        pygame.draw.circle(sprite, glow_color, (center, center), RADIUS + 3)
+        pygame.draw.circle(sprite, color, (center, center), RADIUS)
         pygame.draw.circle(
-            surface, highlight_color, (center_x - 8, center_y - 8), RADIUS // 3
+            sprite, highlight_color, (center - 8, center - 8), RADIUS // 3
         )
+        return sprite
+
+    def render_hover(self, color, pulse):
+        sprite = self.new_sprite()
+        hover_color = tuple(int(c * pulse) for c in color)
+        pygame.draw.circle(sprite, hover_color, (SPRITE_HALF, SPRITE_HALF), RADIUS)
+        return sprite
+
+    def hover_sprite(self, color, pulse):
+        level = round((pulse - 0.7) / 0.3 * (self.pulse_levels - 1))
+        return self.hover[color][max(0, min(self.pulse_levels - 1, level))]
+
+
+class TextCache:
+    # Bounded LRU of rendered text surfaces keyed by (font, text, color),
+    # so labels that rarely change are rasterized once.
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
 
 
 class ConnectFourClient:
-    def __init__(self, host="localhost", port=5555):
+    def __init__(self, host="localhost", port=5555, ai_opponent=False, name=None):
+        self.address = (host, port)
+        self.session = None
+        self.closing = False
+        self.reconnecting = False
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            self.client.connect((host, port))
+            self.client.connect(self.address)
+            join = {"type": "join", "codecs": list(SUPPORTED_CODECS), "deltas": True}
+            if ai_opponent:
+                join["mode"] = "ai"
+            if name:
+                join["name"] = name
+            self.client.sendall(encode_message(join))
             self.connected = True
+            self.codec = PICKLE_CODEC
+            self.reader = FrameReader()
+            self.pending_messages = []
+            print("Waiting for an opponent...")
+            self.player_number = self.wait_for_assignment()
         except Exception as e:
             print(f"Connection error: {e}")
             self.connected = False
             return
 
-        self.player_number = int(self.client.recv(1024).decode())
+        self.init_state()
+        self.init_display()
+
+        self.receive_thread = threading.Thread(target=self.receive_data)
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+
+        self.run_game()
+
+    def init_state(self):
         self.player_color = RED if self.player_number == 0 else YELLOW
         self.opponent_color = YELLOW if self.player_number == 0 else RED
 
@@ -201,13 +323,17 @@ class ConnectFourClient:
         self.turn = 0
         self.game_over = False
         self.winner = None
+        self.winning_cells = []
         self.game_id = 0
+        self.seq = None
+        self.resync_pending = False
         self.waiting_restart = [False, False]
-        self.falling_pieces = []
+        self.clear_animations()
         self.metrics = GameMetrics()
         self.show_metrics = True
         self.hover_collision_detected = False
 
+    def init_display(self):
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT + 150))
         pygame.display.set_caption(
@@ -224,59 +350,242 @@ class ConnectFourClient:
 
         self.restart_button = pygame.Rect(WIDTH // 2 - 100, HEIGHT - 40, 200, 30)
         self.metrics_button = pygame.Rect(10, HEIGHT - 40, 100, 30)
+        self.build_layers()
+        self.sprites = PieceSprites()
+        self.text_cache = TextCache()
+        # (text, surface) per metrics line, re-rendered only when the text
+        # as displayed changes.
+        self.metrics_text = [(None, None)] * 6
+
+        # Each layer is drawn only when a dirty rectangle touches its area,
+        # in this order.
+        self.layers = [
+            (BOARD_RECT, self.draw_board),
+            (PLAY_RECT, self.draw_animations),
+            (STATUS_RECT, self.draw_status_area),
+            (METRICS_RECT, self.draw_metrics),
+            (BUTTONS_RECT, self.draw_buttons),
+            (STATUS_RECT, self.draw_hover_piece),
+        ]
+        self.region_keys = []
+        self.piece_rects = []
+        self.hover = None
+        self.last_hover = None
+        self.full_redraw = True
+        self.shaking = False
+
+    def build_layers(self):
+        # The gradients and holes never change between frames, so they are
+        # drawn once here (and again if the display is recreated) and each
+        # frame only blits them.
+        self.board_layer = self.render_board_layer().convert()
+        self.status_layer = self.render_status_layer().convert()
+
+    def render_board_layer(self):
+        layer = pygame.Surface((WIDTH, HEIGHT - 50 - SQUARE_SIZE))
+        for y in range(SQUARE_SIZE, HEIGHT - 50):
+            intensity = int(
+                200 + 55 * ((y - SQUARE_SIZE) / (HEIGHT - 50 - SQUARE_SIZE))
+            )
+            color = (0, 0, min(255, intensity))
+            pygame.draw.rect(layer, color, (0, y - SQUARE_SIZE, WIDTH, 1))
+        for c in range(COLUMN_COUNT):
+            for r in range(ROW_COUNT):
+                center_x = int(c * SQUARE_SIZE + SQUARE_SIZE / 2)
+                center_y = int(r * SQUARE_SIZE + SQUARE_SIZE / 2)
+                pygame.draw.circle(
+                    layer, (20, 20, 40), (center_x + 2, center_y + 2), RADIUS
+                )
+                pygame.draw.circle(layer, BLACK, (center_x, center_y), RADIUS)
+        return layer
 
-        self.receive_thread = threading.Thread(target=self.receive_data)
-        self.receive_thread.daemon = True
-        self.receive_thread.start()
-
-        self.run_game()
+    def render_status_layer(self):
+        layer = pygame.Surface((WIDTH, SQUARE_SIZE))
+        for y in range(SQUARE_SIZE):
+            intensity = int(40 + 20 * (y / SQUARE_SIZE))
+            color = (intensity, intensity, intensity)
+            pygame.draw.rect(layer, color, (0, y, WIDTH, 1))
+        return layer
+
+    def wait_for_assignment(self):
+        player_number = None
+        while player_number is None:
+            data = self.client.recv(4096)
+            if not data:
+                raise ConnectionError("server closed the connection before assigning a seat")
+            for message in self.reader.messages(data):
+                if message["type"] == "player_assignment":
+                    player_number = message["player"]
+                    self.codec = message.get("codec", PICKLE_CODEC)
+                    self.session = message.get("session")
+                elif message["type"] == "error":
+                    raise ConnectionError(message["reason"])
+                else:
+                    self.pending_messages.append(message)
+        return player_number
 
     def receive_data(self):
         while self.connected:
             try:
+                for message in self.pending_messages:
+                    self.handle_message(message)
+                if self.pending_messages:
+                    self.notify_display()
+                self.pending_messages = []
                 data = self.client.recv(4096)
                 if not data:
-                    print("Disconnected from server")
+                    raise ConnectionError("server closed the connection")
+                self.pending_messages = self.reader.messages(data)
+            except Exception as e:
+                if self.closing:
+                    break
+                print(f"Disconnected from server: {e}")
+                if not self.reconnect():
                     self.connected = False
                     break
-                message = pickle.loads(data)
-                if message["type"] == "game_start" or message["type"] == "game_update":
-                    new_board = np.array(message.get("board", self.board))
-                    if message["type"] == "game_update":
-                        self.add_falling_animations(new_board)
-                        if message.get("turn") != self.turn:
-                            self.metrics.record_move()
-                    self.board = new_board
-                    self.turn = message.get("turn", self.turn)
-                    self.game_over = message.get("game_over", self.game_over)
-                    if "game_id" in message:
-                        self.game_id = message["game_id"]
-                        self.visual_board = np.zeros((ROW_COUNT, COLUMN_COUNT))
-                        self.metrics.reset()
-                        self.falling_pieces = []
-                    if self.game_over and message.get("result") == "win":
-                        self.winner = message.get("winner")
-                        self.visual_board = self.board.copy()
-                elif message["type"] == "player_disconnected":
-                    self.game_over = True
-                    print(f"Player {message.get('player') + 1} disconnected")
-                elif message["type"] == "restart_requested":
-                    self.waiting_restart = message["waiting_restart"]
+
+    def notify_display(self):
+        # Wakes run_game if it is waiting on an idle board.
+        try:
+            pygame.event.post(pygame.event.Event(SERVER_EVENT))
+        except pygame.error:
+            pass
+
+    def reconnect(self):
+        # Resumes the same seat with the session token from our assignment.
+        # The server answers with a resume snapshot of the game in progress.
+        if self.session is None:
+            return False
+        # Sends from the game loop are skipped until this finishes, and their
+        # errors must not mark us disconnected under a fresh connection.
+        self.reconnecting = True
+        try:
+            return self.resume_session()
+        finally:
+            self.reconnecting = False
+
+    def resume_session(self):
+        self.client.close()
+        for attempt in range(RECONNECT_ATTEMPTS):
+            time.sleep(RECONNECT_DELAY)
+            try:
+                self.client = socket.create_connection(self.address)
+                join = {
+                    "type": "join",
+                    "codecs": list(SUPPORTED_CODECS),
+                    "deltas": True,
+                    "session": self.session,
+                }
+                self.client.sendall(encode_message(join))
+                self.reader = FrameReader()
+                self.pending_messages = []
+                self.wait_for_assignment()
+                self.connected = True
+                print("Reconnected to server")
+                return True
             except Exception as e:
-                print(f"Error receiving data: {e}")
-                self.connected = False
-                break
+                print(f"Reconnect attempt {attempt + 1} failed: {e}")
+                self.client.close()
+        return False
+
+    def handle_message(self, message):
+        if message["type"] == "game_start" or message["type"] == "game_update":
+            new_board = np.array(message.get("board", self.board))
+            if message["type"] == "game_update":
+                self.add_falling_animations(new_board)
+                if message.get("turn") != self.turn:
+                    self.metrics.record_move()
+            self.board = new_board
+            self.turn = message.get("turn", self.turn)
+            self.game_over = message.get("game_over", self.game_over)
+            if "game_id" in message:
+                self.game_id = message["game_id"]
+                self.visual_board = np.zeros((ROW_COUNT, COLUMN_COUNT))
+                self.metrics.reset()
+                self.clear_animations()
+                self.winning_cells = []
+            if self.game_over and message.get("result") == "win":
+                self.winner = message.get("winner")
+                self.winning_cells = message.get("winning_cells", [])
+                self.visual_board = self.board.copy()
+        elif message["type"] == "snapshot":
+            self.apply_snapshot(message)
+        elif message["type"] == "resume":
+            self.apply_snapshot(message)
+            self.metrics.moves_made = len(message["move_history"])
+        elif message["type"] == "move_delta":
+            self.apply_move_delta(message)
+        elif message["type"] == "player_disconnected":
+            self.game_over = True
+            print(f"Player {message.get('player') + 1} disconnected")
+        elif message["type"] == "player_away":
+            print(f"Player {message['player'] + 1} lost connection, waiting for them to return")
+        elif message["type"] == "player_returned":
+            print(f"Player {message['player'] + 1} reconnected")
+        elif message["type"] == "restart_requested":
+            self.waiting_restart = message["waiting_restart"]
+
+    def apply_snapshot(self, message):
+        new_board = np.array(message["board"])
+        if message["game_id"] != self.game_id:
+            self.game_id = message["game_id"]
+            self.metrics.reset()
+            self.winning_cells = []
+        self.clear_animations()
+        self.board = new_board
+        self.visual_board = new_board.copy()
+        self.turn = message["turn"]
+        self.game_over = message["game_over"]
+        self.seq = message["seq"]
+        self.resync_pending = False
+        if self.game_over and message.get("result") == "win":
+            self.winner = message.get("winner")
+            self.winning_cells = message.get("winning_cells", [])
+
+    def apply_move_delta(self, message):
+        if self.seq is not None and message["seq"] <= self.seq:
+            # Already covered by a snapshot that overtook a dropped backlog.
+            return
+        if self.seq is None or message["seq"] != self.seq + 1:
+            self.request_resync()
+            return
+        self.seq = message["seq"]
+        row, col = message["row"], message["column"]
+        self.board[row][col] = message["player"] + 1
+        self.add_falling_piece(row, col, message["player"] + 1)
+        if message["turn"] != self.turn:
+            self.metrics.record_move()
+        self.turn = message["turn"]
+        self.game_over = message["game_over"]
+        if self.game_over and message.get("result") == "win":
+            self.winner = message.get("winner")
+            self.winning_cells = message.get("winning_cells", [])
+            self.visual_board = self.board.copy()
+
+    def request_resync(self):
+        if self.resync_pending:
+            return
+        self.resync_pending = True
+        try:
+            self.client.sendall(encode_message({"type": "resync_request"}, self.codec))
+        except Exception as e:
+            print(f"Error requesting resync: {e}")
+            self.send_failed()
 
     def add_falling_animations(self, new_board):
         for c in range(COLUMN_COUNT):
             for r in range(ROW_COUNT):
                 if new_board[r][c] != 0 and self.visual_board[r][c] == 0:
-                    piece_color = RED if new_board[r][c] == 1 else YELLOW
-                    visual_row = ROW_COUNT - 1 - r
-                    falling_piece = FallingPiece(c, visual_row, piece_color)
-                    self.falling_pieces.append(falling_piece)
-                    self.metrics.record_animation()
-                    self.visual_board[r][c] = new_board[r][c]
+                    self.add_falling_piece(r, c, new_board[r][c])
+
+    def add_falling_piece(self, row, col, piece):
+        piece_color = RED if piece == 1 else YELLOW
+        visual_row = ROW_COUNT - 1 - row
+        falling_piece = FallingPiece(col, visual_row, piece_color)
+        self.falling_pieces.append(falling_piece)
+        self.animating_cells.add((visual_row, col))
+        self.metrics.record_animation()
+        self.visual_board[row][col] = piece
 
     def check_gjk_collisions(self):
 
@@ -300,65 +609,57 @@ class ConnectFourClient:
             self.shake_timer = 0.2
 
     def send_move(self, column):
+        if self.reconnecting:
+            return
         if self.connected and not self.game_over and self.turn == self.player_number:
             message = {"type": "move", "column": column}
             try:
-                self.client.send(pickle.dumps(message))
+                self.client.sendall(encode_message(message, self.codec))
             except Exception as e:
                 print(f"Error sending move: {e}")
-                self.connected = False
+                self.send_failed()
+
+    def send_failed(self):
+        # While reconnecting, the receive thread owns the connection state.
+        if not self.reconnecting:
+            self.connected = False
 
     def request_restart(self):
-        if self.connected:
+        if self.connected and not self.reconnecting:
             message = {"type": "restart_request"}
             try:
-                self.client.send(pickle.dumps(message))
-                self.falling_pieces = []
+                self.client.sendall(encode_message(message, self.codec))
+                self.clear_animations()
             except Exception as e:
                 print(f"Error requesting restart: {e}")
-                self.connected = False
+                self.send_failed()
 
     def draw_board(self, surface):
-        for y in range(SQUARE_SIZE, HEIGHT - 50):
-            intensity = int(
-                200 + 55 * ((y - SQUARE_SIZE) / (HEIGHT - 50 - SQUARE_SIZE))
-            )
-            color = (0, 0, min(255, intensity))
-            pygame.draw.rect(surface, color, (0, y, WIDTH, 1))
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT):
+        surface.blit(self.board_layer, (0, SQUARE_SIZE))
+        for row, c in zip(*np.nonzero(self.visual_board)):
+            r = ROW_COUNT - 1 - int(row)
+            if (r, c) not in self.animating_cells:
+                piece_color = RED if self.visual_board[row][c] == 1 else YELLOW
                 center_x = int(c * SQUARE_SIZE + SQUARE_SIZE / 2)
                 center_y = int((r + 1) * SQUARE_SIZE + SQUARE_SIZE / 2)
-                pygame.draw.circle(
-                    surface, (20, 20, 40), (center_x + 2, center_y + 2), RADIUS
-                )
-                pygame.draw.circle(surface, BLACK, (center_x, center_y), RADIUS)
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT):
-                if self.visual_board[ROW_COUNT - 1 - r][c] != 0:
-                    is_animated = any(
-                        p.col == c and p.end_row == r and p.active
-                        for p in self.falling_pieces
-                    )
-                    if not is_animated:
-                        piece_color = (
-                            RED
-                            if self.visual_board[ROW_COUNT - 1 - r][c] == 1
-                            else YELLOW
-                        )
-                        center_x = int(c * SQUARE_SIZE + SQUARE_SIZE / 2)
-                        center_y = int((r + 1) * SQUARE_SIZE + SQUARE_SIZE / 2)
-                        self.draw_static_piece(surface, center_x, center_y, piece_color)
+                self.draw_static_piece(surface, center_x, center_y, piece_color)
+        if self.winning_cells and not self.falling_pieces:
+            for r, c in self.winning_cells:
+                center_x = int(c * SQUARE_SIZE + SQUARE_SIZE / 2)
+                center_y = int((ROW_COUNT - r) * SQUARE_SIZE + SQUARE_SIZE / 2)
+                pygame.draw.circle(surface, WHITE, (center_x, center_y), RADIUS, 4)
 
     def draw_static_piece(self, surface, center_x, center_y, piece_color):
-        highlight = tuple(min(255, c + 80) for c in piece_color)
-        shadow = tuple(max(0, c - 80) for c in piece_color)
-        pygame.draw.circle(surface, shadow, (center_x + 3, center_y + 3), RADIUS)
-        pygame.draw.circle(surface, piece_color, (center_x, center_y), RADIUS)
-        pygame.draw.circle(
-            surface, highlight, (center_x - 5, center_y - 5), RADIUS // 3
+        surface.blit(
+            self.sprites.static[piece_color],
+            (center_x - SPRITE_HALF, center_y - SPRITE_HALF),
         )
 
+    def clear_animations(self):
+        self.falling_pieces = []
+        # (visual row, column) of every piece still falling.
+        self.animating_cells = set()
+
     def update_animations(self):
         i = 0
         while i < len(self.falling_pieces):
@@ -384,33 +685,31 @@ class ConnectFourClient:
                 self.visual_board[board_row][piece.col] = self.board[board_row][
                     piece.col
                 ]
+                self.animating_cells.discard((piece.end_row, piece.col))
                 del self.falling_pieces[i]
             else:
                 i += 1
 
     def draw_animations(self, surface):
         for piece in self.falling_pieces:
-            piece.draw(surface)
+            piece.draw(surface, self.sprites)
 
     def draw_status_area(self, surface):
-        for y in range(SQUARE_SIZE):
-            intensity = int(40 + 20 * (y / SQUARE_SIZE))
-            color = (intensity, intensity, intensity)
-            pygame.draw.rect(surface, color, (0, y, WIDTH, 1))
+        surface.blit(self.status_layer, (0, 0))
 
         if self.game_over:
             if self.winner is not None:
-                text = self.large_font.render(
+                text = self.text_cache.render(
+                    self.large_font,
                     "Victory!" if self.winner == self.player_number else "Defeat!",
-                    True,
                     GREEN if self.winner == self.player_number else RED,
                 )
             else:
-                text = self.large_font.render("Draw!", True, WHITE)
+                text = self.text_cache.render(self.large_font, "Draw!", WHITE)
         else:
-            text = self.font.render(
+            text = self.text_cache.render(
+                self.font,
                 "Your Turn" if self.turn == self.player_number else "Opponent's Turn",
-                True,
                 (
                     self.player_color
                     if self.turn == self.player_number
@@ -420,8 +719,8 @@ class ConnectFourClient:
 
         text_rect = text.get_rect(center=(WIDTH // 2, SQUARE_SIZE // 2))
         surface.blit(text, text_rect)
-        player_text = self.font.render(
-            f"Player {self.player_number + 1}", True, self.player_color
+        player_text = self.text_cache.render(
+            self.font, f"Player {self.player_number + 1}", self.player_color
         )
         surface.blit(player_text, (10, 10))
         if any(self.waiting_restart):
@@ -430,9 +729,9 @@ class ConnectFourClient:
                 if self.waiting_restart[self.player_number]
                 else "Opponent wants restart"
             )
-            waiting_text = self.small_font.render(
+            waiting_text = self.text_cache.render(
+                self.small_font,
                 waiting_text_str,
-                True,
                 WHITE if self.waiting_restart[self.player_number] else ORANGE,
             )
             waiting_rect = waiting_text.get_rect(
@@ -445,10 +744,18 @@ class ConnectFourClient:
             return
         metrics_y, metrics_area_height = HEIGHT + 10, 150
         pygame.draw.rect(surface, (30, 30, 30), (0, HEIGHT, WIDTH, metrics_area_height))
+        for i, text in enumerate(self.metrics_lines()):
+            if self.metrics_text[i][0] != text:
+                color = WHITE if i < 4 else PURPLE
+                self.metrics_text[i] = (text, self.small_font.render(text, True, color))
+            rendered = self.metrics_text[i][1]
+            surface.blit(rendered, (10 + (i % 2) * 280, metrics_y + (i // 2) * 25))
+
+    def metrics_lines(self):
         duration = self.metrics.get_game_duration()
         avg_move = self.metrics.get_average_move_time()
         moves_min = self.metrics.get_moves_per_minute()
-        metrics_text = [
+        return [
             f"Game Duration: {duration:.1f}s",
             f"Moves Made: {self.metrics.moves_made}",
             f"Avg Move Time: {avg_move:.2f}s",
@@ -456,10 +763,6 @@ class ConnectFourClient:
             f"GJK Checks: {self.metrics.collision_checks}",
             f"Animations: {self.metrics.animations_played}",
         ]
-        for i, text in enumerate(metrics_text):
-            color = WHITE if i < 4 else PURPLE
-            rendered = self.small_font.render(text, True, color)
-            surface.blit(rendered, (10 + (i % 2) * 280, metrics_y + (i // 2) * 25))
 
     def draw_buttons(self, surface):
         button_color = (
@@ -469,7 +772,7 @@ class ConnectFourClient:
         )
         pygame.draw.rect(surface, button_color, self.restart_button)
         pygame.draw.rect(surface, WHITE, self.restart_button, 2)
-        restart_text = self.font.render("Restart", True, WHITE)
+        restart_text = self.text_cache.render(self.font, "Restart", WHITE)
         surface.blit(
             restart_text, restart_text.get_rect(center=self.restart_button.center)
         )
@@ -477,55 +780,138 @@ class ConnectFourClient:
         metrics_color = ORANGE if self.show_metrics else GRAY
         pygame.draw.rect(surface, metrics_color, self.metrics_button)
         pygame.draw.rect(surface, WHITE, self.metrics_button, 2)
-        metrics_text = self.font.render("Metrics", True, WHITE)
+        metrics_text = self.text_cache.render(self.font, "Metrics", WHITE)
         surface.blit(
             metrics_text, metrics_text.get_rect(center=self.metrics_button.center)
         )
 
+    def update_hover(self):
+        # Fixed once per frame so the dirty rectangles match what is drawn.
+        if self.game_over or self.turn != self.player_number:
+            self.hover = None
+            return
+        posx = pygame.mouse.get_pos()[0]
+        pulse = abs(math.sin(time.time() * 3)) * 0.3 + 0.7
+        self.hover = (
+            self.sprites.hover_sprite(self.player_color, pulse),
+            (posx - SPRITE_HALF, SQUARE_SIZE // 2 - SPRITE_HALF),
+        )
+
     def draw_hover_piece(self, surface):
+        if self.hover is not None:
+            surface.blit(*self.hover)
+
+    def dirty_rects(self):
+        # A region is dirty when anything it shows has changed since the
+        # last frame; moving pieces dirty both their old and new bounds.
+        regions = [
+            (
+                STATUS_RECT,
+                (self.game_over, self.winner, self.turn, tuple(self.waiting_restart)),
+            ),
+            (
+                BOARD_RECT,
+                (
+                    self.visual_board.tobytes(),
+                    str(self.winning_cells),
+                    frozenset(self.animating_cells),
+                ),
+            ),
+            (
+                BUTTONS_RECT,
+                (
+                    self.waiting_restart[self.player_number],
+                    self.game_over,
+                    self.show_metrics,
+                ),
+            ),
+            (METRICS_RECT, self.show_metrics and self.metrics_lines()),
+        ]
+        keys = [key for _, key in regions]
+        dirty = [
+            rect
+            for (rect, key), old_key in zip(regions, self.region_keys or [None] * 4)
+            if key != old_key
+        ]
+        self.region_keys = keys
+
+        piece_rects = [piece.rect() for piece in self.falling_pieces]
+        if piece_rects != self.piece_rects:
+            dirty += self.piece_rects + piece_rects
+        self.piece_rects = piece_rects
+        if self.hover != self.last_hover:
+            for hover in (self.last_hover, self.hover):
+                if hover is not None:
+                    dirty.append(pygame.Rect(hover[1], hover[0].get_size()))
+        self.last_hover = self.hover
+        return [rect.clip(SCREEN_RECT) for rect in dirty]
+
+    def draw_region(self, surface, rect):
+        surface.set_clip(rect)
+        surface.fill(BLACK)
+        for area, draw in self.layers:
+            if area.colliderect(rect):
+                draw(surface)
+        surface.set_clip(None)
+
+    def render_frame(self):
+        dirty = self.dirty_rects()
+        shaking, was_shaking = self.shake_timer > 0, self.shaking
+        self.shaking = shaking
+        if self.full_redraw or shaking or was_shaking:
+            dirty = [SCREEN_RECT]
+            self.full_redraw = False
+        if not dirty:
+            return
+        for rect in dirty:
+            self.draw_region(self.display_surface, rect)
 
-        if not self.game_over and self.turn == self.player_number:
-            posx = pygame.mouse.get_pos()[0]
-            pulse = abs(math.sin(time.time() * 3)) * 0.3 + 0.7
-            hover_color = tuple(int(c * pulse) for c in self.player_color)
-            pygame.draw.circle(
-                surface, hover_color, (posx, int(SQUARE_SIZE / 2)), RADIUS
-            )
+        if shaking or was_shaking:
+            shake_offset = (0, 0)
+            if shaking:
+                shake_offset = (
+                    random.randint(-self.shake_intensity, self.shake_intensity),
+                    random.randint(-self.shake_intensity, self.shake_intensity),
+                )
+            self.screen.fill(BLACK)
+            self.screen.blit(self.display_surface, shake_offset)
+            pygame.display.update()
+            return
+        for rect in dirty:
+            self.screen.blit(self.display_surface, rect, rect)
+        pygame.display.update(dirty)
+
+    def is_idle(self):
+        return not self.falling_pieces and self.shake_timer <= 0 and self.hover is None
 
     def run_game(self):
         if not self.connected:
             return
         running, clock = True, pygame.time.Clock()
         while running:
-            delta_time = clock.tick(60) / 1000.0
+            delta_time = clock.tick(FPS) / 1000.0
 
             if self.shake_timer > 0:
                 self.shake_timer -= delta_time
             self.check_gjk_collisions()
             self.update_animations()
-
-            self.display_surface.fill(BLACK)
-            self.draw_board(self.display_surface)
-            self.draw_animations(self.display_surface)
-            self.draw_status_area(self.display_surface)
-            self.draw_metrics(self.display_surface)
-            self.draw_buttons(self.display_surface)
-            self.draw_hover_piece(self.display_surface)
-
-            shake_offset = (0, 0)
-            if self.shake_timer > 0:
-                shake_offset = (
-                    random.randint(-self.shake_intensity, self.shake_intensity),
-                    random.randint(-self.shake_intensity, self.shake_intensity),
-                )
-
-            self.screen.fill(BLACK)
-            self.screen.blit(self.display_surface, shake_offset)
-            pygame.display.update()
-
-            for event in pygame.event.get():
+            self.update_hover()
+            self.render_frame()
+
+            events = pygame.event.get()
+            if not events and self.is_idle():
+                # Server messages post SERVER_EVENT, so this only sleeps
+                # while nothing on screen can change.
+                events = [
+                    pygame.event.wait(
+                        IDLE_REFRESH_MS if self.show_metrics else IDLE_WAIT_MS
+                    )
+                ]
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.full_redraw = True
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if self.restart_button.collidepoint(event.pos):
                         if not self.waiting_restart[self.player_number]:
@@ -541,6 +927,7 @@ class ConnectFourClient:
                         if 0 <= col < COLUMN_COUNT:
                             self.send_move(col)
 
+        self.closing = True
         pygame.quit()
         self.client.close()
         sys.exit()
@@ -550,5 +937,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Enhanced Connect Four Client")
     parser.add_argument("--host", default="localhost", help="Server host address")
     parser.add_argument("--port", type=int, default=5555, help="Server port")
+    parser.add_argument(
+        "--ai", action="store_true", help="Play against the server's AI opponent"
+    )
+    parser.add_argument(
+        "--name", default=None, help="Player name used for rating-based matchmaking"
+    )
     args = parser.parse_args()
-    client = ConnectFourClient(host=args.host, port=args.port)
+    client = ConnectFourClient(
+        host=args.host, port=args.port, ai_opponent=args.ai, name=args.name
+    )
@@ -0,0 +1,89 @@
+import collections
+import socket
+import threading
+
+from protocol import PICKLE_CODEC
+from metrics import REGISTRY
+
+# Frames waiting to be written to one subscriber. A subscriber that falls
+# further behind than this has its backlog dropped and is sent one fresh
+# snapshot instead once its socket drains.
+MAX_QUEUED_FRAMES = 64
+
+CONNECTED_SOCKETS = REGISTRY.gauge('connect4_connected_sockets', 'Client sockets currently open')
+BYTES_IN = REGISTRY.counter('connect4_bytes_in_total', 'Bytes received from clients')
+BYTES_OUT = REGISTRY.counter('connect4_bytes_out_total', 'Bytes written to clients')
+
+
+class Connection:
+    def __init__(self, sock, codec=PICKLE_CODEC, deltas=False, max_queued=MAX_QUEUED_FRAMES):
+        self.sock = sock
+        self.codec = codec
+        self.deltas = deltas
+        self.max_queued = max_queued
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.needs_resync = False
+        self.resync_source = None
+        self.closed = False
+        self.dropped = 0
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def sendall(self, data):
+        # Never blocks the caller: game threads only append to the queue, the
+        # writer thread does the socket I/O.
+        with self.condition:
+            if self.closed:
+                raise ConnectionResetError("connection is closed")
+            if len(self.queue) >= self.max_queued and self.resync_source is not None:
+                self.queue.clear()
+                self.needs_resync = True
+                self.dropped += 1
+            else:
+                self.queue.append(data)
+            self.condition.notify()
+
+    def write_loop(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.needs_resync and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.queue:
+                    return
+                resync, self.needs_resync = self.needs_resync, False
+                batch = list(self.queue)
+                self.queue.clear()
+            try:
+                if resync:
+                    # Everything queued so far is older than the snapshot.
+                    batch = [self.resync_source()]
+                data = b''.join(batch)
+                self.sock.sendall(data)
+                BYTES_OUT.inc(len(data))
+            except OSError:
+                with self.condition:
+                    self.closed = True
+                    self.queue.clear()
+                return
+
+    def abort(self):
+        # Drops queued frames and shuts the socket down, which also ends the
+        # blocking recv in the thread handling this connection.
+        with self.condition:
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self, timeout=1.0):
+        # Stops accepting frames, lets the writer flush what is already
+        # queued and waits briefly for it so the socket can then be closed.
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if threading.current_thread() is not self.writer:
+            self.writer.join(timeout)
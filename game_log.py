@@ -0,0 +1,197 @@
+import os
+import queue
+import struct
+import threading
+import time
+
+MAGIC = b'C4GL'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+# Each record: length of the rest of the record, then game id, start time,
+# result, winner (-1 for none) and move count, followed by one byte per move
+# (player << 3 | column) and one varint per move holding the milliseconds
+# since the previous move (or since the start for the first).
+RECORD_LENGTH = struct.Struct('<H')
+RECORD_HEADER = struct.Struct('<IdBbB')
+
+RESULT_CODES = {'win': 1, 'draw': 2, 'abandoned': 3}
+RESULT_NAMES = {code: name for name, code in RESULT_CODES.items()}
+
+
+def encode_varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_record(game_id, start_time, result, winner, move_history):
+    body = bytearray(RECORD_HEADER.pack(game_id, start_time, RESULT_CODES[result],
+                                        -1 if winner is None else winner, len(move_history)))
+    body += bytes((move['player'] << 3) | move['column'] for move in move_history)
+    previous = 0
+    for move in move_history:
+        elapsed = int(move['timestamp'] * 1000)
+        encode_varint(max(0, elapsed - previous), body)
+        previous = max(previous, elapsed)
+    return RECORD_LENGTH.pack(len(body)) + body
+
+
+def decode_record(body):
+    game_id, start_time, result, winner, count = RECORD_HEADER.unpack_from(body, 0)
+    offset = RECORD_HEADER.size
+    moves = body[offset:offset + count]
+    offset += count
+    history, elapsed = [], 0
+    for move in moves:
+        delta, offset = decode_varint(body, offset)
+        elapsed += delta
+        history.append({'player': move >> 3, 'column': move & 0x7, 'timestamp': elapsed / 1000})
+    return {
+        'game_id': game_id,
+        'start_time': start_time,
+        'result': RESULT_NAMES[result],
+        'winner': None if winner < 0 else winner,
+        'move_history': history,
+    }
+
+
+class GameLogWriter:
+    # Games are handed over as plain tuples and encoded on the writer
+    # thread, so appending from a game thread is a single queue put.
+    def __init__(self, path, sync_interval=1.0):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.queue = queue.SimpleQueue()
+        # A record torn by a crash is cut off before appending, otherwise the
+        # next record would be read as the rest of it.
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        end = complete_length(path) if size else 0
+        self.file = open(path, 'ab')
+        self.truncated_bytes = size - end
+        if self.truncated_bytes:
+            self.file.truncate(end)
+        if end == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.games_written = 0
+        self.bytes_written = 0
+        self.syncs = 0
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def append(self, game_id, start_time, result, winner, move_history):
+        self.queue.put((game_id, start_time, result, winner, move_history))
+
+    def write_loop(self):
+        dirty = False
+        next_sync = time.monotonic() + self.sync_interval
+        while True:
+            try:
+                game = self.queue.get(timeout=max(0, next_sync - time.monotonic()))
+            except queue.Empty:
+                game = ()
+            if game is None:
+                break
+            if game:
+                record = encode_record(*game)
+                self.file.write(record)
+                self.games_written += 1
+                self.bytes_written += len(record)
+                dirty = True
+            if time.monotonic() >= next_sync:
+                if dirty:
+                    self.sync()
+                    dirty = False
+                next_sync = time.monotonic() + self.sync_interval
+        self.sync()
+        self.file.close()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.syncs += 1
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+
+    def get_stats(self):
+        return {
+            'games_written': self.games_written,
+            'bytes_written': self.bytes_written,
+            'pending': self.queue.qsize(),
+            'syncs': self.syncs,
+            'truncated_bytes': self.truncated_bytes,
+        }
+
+
+def scan_records(f, path):
+    # Yields each decoded game and the file offset just past it. A record
+    # cut short or garbled by a crash ends the scan instead of raising.
+    header = f.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size:
+        return
+    magic, version = FILE_HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} game log")
+    while True:
+        prefix = f.read(RECORD_LENGTH.size)
+        if len(prefix) < RECORD_LENGTH.size:
+            return
+        length, = RECORD_LENGTH.unpack(prefix)
+        body = f.read(length)
+        if len(body) < length:
+            return
+        try:
+            game = decode_record(body)
+        except (struct.error, IndexError, KeyError):
+            return
+        yield game, f.tell()
+
+
+def complete_length(path):
+    # Bytes up to the end of the last complete record (0 if not even the
+    # file header made it to disk).
+    with open(path, 'rb') as f:
+        end = FILE_HEADER.size if os.path.getsize(path) >= FILE_HEADER.size else 0
+        for _, end in scan_records(f, path):
+            pass
+        return end
+
+
+def read_games(path):
+    # Streams records one at a time.
+    with open(path, 'rb') as f:
+        for game, _ in scan_records(f, path):
+            yield game
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Summarize a Connect Four game log')
+    parser.add_argument('path', help='Game log written by the server with --game-log')
+    parser.add_argument('--show', type=int, default=0, help='Print the first N games')
+    args = parser.parse_args()
+
+    games, moves, results = 0, 0, {}
+    for game in read_games(args.path):
+        if games < args.show:
+            columns = ''.join(str(move['column']) for move in game['move_history'])
+            print(f"Game {game['game_id']}: {game['result']}, winner {game['winner']}, moves {columns}")
+        games += 1
+        moves += len(game['move_history'])
+        results[game['result']] = results.get(game['result'], 0) + 1
+    print(f"{games} games, {moves} moves, {moves / games if games else 0:.1f} moves per game")
+    print("Results:", results)
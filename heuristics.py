@@ -0,0 +1,110 @@
+import numpy as np
+
+from bitboard import Position, ROW_COUNT, COLUMN_COUNT
+
+CENTER_COLUMN = COLUMN_COUNT // 2
+
+
+def build_window_tables():
+    # Same window order as AIHeuristics.evaluate_window_sequences:
+    # horizontal, vertical, rising diagonal, falling diagonal.
+    windows = []
+    for r in range(ROW_COUNT):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append([(r, c + i) for i in range(4)])
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT - 3):
+            windows.append([(r + i, c) for i in range(4)])
+    for r in range(ROW_COUNT - 3):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append([(r + i, c + i) for i in range(4)])
+    for r in range(3, ROW_COUNT):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append([(r - i, c + i) for i in range(4)])
+    cells = np.array(windows, dtype=np.intp)
+    return cells[..., 0], cells[..., 1]
+
+
+WINDOW_ROWS, WINDOW_COLS = build_window_tables()
+
+
+class AIHeuristics:
+
+    @staticmethod
+    def evaluate_position(board, piece):
+        if isinstance(board, Position):
+            board = board.to_array()
+        return int(AIHeuristics.evaluate_positions(board, piece))
+
+    @staticmethod
+    def evaluate_positions(boards, piece):
+        # Accepts a single (ROW_COUNT, COLUMN_COUNT) board or a stacked
+        # (N, ROW_COUNT, COLUMN_COUNT) batch and returns one score per board.
+        boards = np.asarray(boards)
+        opponent_piece = 2 if piece == 1 else 1
+
+        windows = boards[..., WINDOW_ROWS, WINDOW_COLS]
+        piece_count = np.count_nonzero(windows == piece, axis=-1)
+        empty_count = np.count_nonzero(windows == 0, axis=-1)
+        opponent_count = np.count_nonzero(windows == opponent_piece, axis=-1)
+
+        window_scores = (
+            100 * (piece_count == 4)
+            + 10 * ((piece_count == 3) & (empty_count == 1))
+            + 2 * ((piece_count == 2) & (empty_count == 2))
+            - 80 * ((opponent_count == 3) & (empty_count == 1))
+        )
+        center_count = np.count_nonzero(boards[..., CENTER_COLUMN] == piece, axis=-1)
+        return window_scores.sum(axis=-1) + center_count * 3
+
+    @staticmethod
+    def evaluate_window_sequences(board, piece, horizontal=False, vertical=False, diagonal=False):
+        score = 0
+
+        if horizontal:
+            for r in range(ROW_COUNT):
+                for c in range(COLUMN_COUNT - 3):
+                    window = [board[r][c+i] for i in range(4)]
+                    score += AIHeuristics.score_window(window, piece)
+
+        if vertical:
+            for c in range(COLUMN_COUNT):
+                for r in range(ROW_COUNT - 3):
+                    window = [board[r+i][c] for i in range(4)]
+                    score += AIHeuristics.score_window(window, piece)
+
+        if diagonal:
+
+            for r in range(ROW_COUNT - 3):
+                for c in range(COLUMN_COUNT - 3):
+                    window = [board[r+i][c+i] for i in range(4)]
+                    score += AIHeuristics.score_window(window, piece)
+
+
+            for r in range(3, ROW_COUNT):
+                for c in range(COLUMN_COUNT - 3):
+                    window = [board[r-i][c+i] for i in range(4)]
+                    score += AIHeuristics.score_window(window, piece)
+
+        return score
+
+    @staticmethod
+    def score_window(window, piece):
+        score = 0
+        opponent_piece = 2 if piece == 1 else 1
+
+        piece_count = window.count(piece)
+        empty_count = window.count(0)
+        opponent_count = window.count(opponent_piece)
+
+        if piece_count == 4:
+            score += 100
+        elif piece_count == 3 and empty_count == 1:
+            score += 10
+        elif piece_count == 2 and empty_count == 2:
+            score += 2
+
+        if opponent_count == 3 and empty_count == 1:
+            score -= 80
+
+        return score
@@ -0,0 +1,200 @@
+import asyncio
+import random
+import time
+from multiprocessing import Pool
+
+from ai import NegamaxAI
+from bitboard import Position
+from protocol import decode_message, encode_message, read_frame, SUPPORTED_CODECS, PICKLE_CODEC
+from stats import QuantileSketch
+from transposition import TranspositionTable
+
+# Headless players for soak and capacity tests. Nothing here imports
+# pygame; players speak the same protocol as client.py over asyncio.
+
+RECONNECT_DELAY = 0.5
+
+
+class LoadStats:
+    def __init__(self):
+        self.moves = 0
+        self.games = 0
+        self.connections = 0
+        self.errors = {}
+        self.round_trips = QuantileSketch(min_value=0.00001, max_value=60)
+        self.max_round_trip = 0.0
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def record_round_trip(self, elapsed):
+        self.moves += 1
+        self.round_trips.add(elapsed)
+        self.max_round_trip = max(self.max_round_trip, elapsed)
+
+    def merge(self, other):
+        self.moves += other.moves
+        self.games += other.games
+        self.connections += other.connections
+        for kind, count in other.errors.items():
+            self.errors[kind] = self.errors.get(kind, 0) + count
+        self.round_trips.merge(other.round_trips)
+        self.max_round_trip = max(self.max_round_trip, other.max_round_trip)
+
+    def report(self, elapsed):
+        p50, p99 = self.round_trips.quantile(0.5), self.round_trips.quantile(0.99)
+        print(f"Duration: {elapsed:.1f}s, connections: {self.connections}")
+        print(f"Moves: {self.moves} ({self.moves / elapsed:.1f} moves/s), games: {self.games} "
+              f"({self.games / elapsed:.2f} games/s)")
+        print(f"Move round trip: p50 {p50 * 1000:.2f}ms, p99 {p99 * 1000:.2f}ms, "
+              f"max {self.max_round_trip * 1000:.2f}ms")
+        print(f"Errors: {sum(self.errors.values())}", self.errors if self.errors else '')
+
+
+class SimulatedPlayer:
+    def __init__(self, options, stats, transposition_table=None):
+        self.options = options
+        self.stats = stats
+        self.ai = None
+        if options.strategy == 'ai':
+            self.ai = NegamaxAI(time_budget_ms=options.ai_time_ms, transposition_table=transposition_table)
+
+    async def run(self, deadline):
+        while time.monotonic() < deadline:
+            try:
+                await self.play_session(deadline)
+            except (OSError, asyncio.IncompleteReadError):
+                self.stats.error('connection')
+            except asyncio.TimeoutError:
+                self.stats.error('timeout')
+            except Exception as e:
+                self.stats.error(type(e).__name__)
+            await asyncio.sleep(RECONNECT_DELAY if time.monotonic() < deadline else 0)
+
+    async def play_session(self, deadline):
+        options = self.options
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(options.host, options.port),
+                                                options.timeout)
+        self.stats.connections += 1
+        join = {'type': 'join', 'codecs': options.codecs, 'deltas': options.deltas}
+        if options.mode == 'ai':
+            join['mode'] = 'ai'
+        writer.write(encode_message(join))
+
+        codec, player, position, turn, game_over = PICKLE_CODEC, None, Position(), 0, False
+        pending = None
+        try:
+            while time.monotonic() < deadline:
+                # Before the first assignment the matchmaker may still be
+                # looking for an opponent, so only time out once seated.
+                timeout = options.timeout if player is not None else max(0.1, deadline - time.monotonic())
+                try:
+                    message = decode_message(await asyncio.wait_for(read_frame(reader), timeout))
+                except asyncio.TimeoutError:
+                    if player is None:
+                        return
+                    raise
+                kind = message['type']
+
+                if kind == 'player_assignment':
+                    player, codec = message['player'], message.get('codec', PICKLE_CODEC)
+                    continue
+                if kind in ('game_start', 'game_update', 'snapshot', 'resume'):
+                    position = Position.from_array(message['board'])
+                elif kind == 'move_delta':
+                    position.play(message['column'], message['player'] + 1)
+                elif kind == 'player_disconnected':
+                    self.stats.error('opponent_left')
+                    return
+                elif kind == 'error':
+                    self.stats.error(message.get('reason', 'error'))
+                    return
+                else:
+                    continue
+
+                if pending is not None and sum(position.heights) >= pending[1]:
+                    self.stats.record_round_trip(time.perf_counter() - pending[0])
+                    pending = None
+
+                if kind == 'game_start' or (kind == 'snapshot' and not message['game_over']):
+                    game_over = False
+                turn = message.get('turn', turn)
+                if message.get('game_over') and not game_over:
+                    game_over = True
+                    pending = None
+                    # Both seats of a human game see it end; count it once.
+                    if options.mode == 'ai' or player == 0:
+                        self.stats.games += 1
+                    writer.write(encode_message({'type': 'restart_request'}, codec))
+                elif not game_over and turn == player and pending is None:
+                    column = await self.choose_move(position, player)
+                    if options.think_ms:
+                        await asyncio.sleep(options.think_ms / 1000)
+                    pending = (time.perf_counter(), sum(position.heights) + 1)
+                    writer.write(encode_message({'type': 'move', 'column': column}, codec))
+        finally:
+            writer.close()
+
+    async def choose_move(self, position, player):
+        if self.ai is None:
+            return random.choice(position.valid_columns())
+        loop = asyncio.get_running_loop()
+        column, _ = await loop.run_in_executor(None, self.ai.choose_move, position.copy(), player + 1)
+        return column
+
+
+async def run_players(options, count):
+    stats = LoadStats()
+    deadline = time.monotonic() + options.duration
+    # One table per process, shared by every AI player in it.
+    table = TranspositionTable(options.tt_mb) if options.strategy == 'ai' else None
+    players = [SimulatedPlayer(options, stats, table) for _ in range(count)]
+    await asyncio.gather(*(player.run(deadline) for player in players))
+    return stats
+
+
+def run_worker(args):
+    options, count = args
+    return asyncio.run(run_players(options, count))
+
+
+def run(options):
+    start = time.monotonic()
+    if options.processes > 1:
+        shares = [options.players // options.processes + (i < options.players % options.processes)
+                  for i in range(options.processes)]
+        with Pool(options.processes) as pool:
+            results = pool.map(run_worker, [(options, share) for share in shares if share])
+        stats = LoadStats()
+        for result in results:
+            stats.merge(result)
+    else:
+        stats = asyncio.run(run_players(options, options.players))
+    stats.report(time.monotonic() - start)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless Connect Four load generator')
+    parser.add_argument('--host', default='localhost', help='Server host address')
+    parser.add_argument('--port', type=int, default=5555, help='Server port')
+    parser.add_argument('--players', type=int, default=100, help='Number of simulated players')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--processes', type=int, default=1, help='Spread players over this many processes')
+    parser.add_argument('--mode', choices=['human', 'ai'], default='human',
+                        help='Pair players with each other or against the server AI')
+    parser.add_argument('--strategy', choices=['random', 'ai'], default='random', help='How players pick moves')
+    parser.add_argument('--ai-time-ms', type=int, default=20, help='Search budget for --strategy ai')
+    parser.add_argument('--tt-mb', type=float, default=16,
+                        help='Transposition table size shared by the AI players of each process')
+    parser.add_argument('--think-ms', type=float, default=0, help='Delay before each move')
+    parser.add_argument('--codec', choices=list(SUPPORTED_CODECS), default=None,
+                        help='Only offer this wire format (default: offer all)')
+    parser.add_argument('--no-deltas', dest='deltas', action='store_false', help='Ask for full board updates')
+    parser.add_argument('--timeout', type=float, default=10, help='Seconds to wait for a server reply')
+    options = parser.parse_args()
+    options.codecs = [options.codec] if options.codec else list(SUPPORTED_CODECS)
+
+    run(options)
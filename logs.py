@@ -0,0 +1,40 @@
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler formats the message on the calling thread.
+    # Records only carry immutable arguments or objects that are safe to
+    # format later, so formatting is left to the listener thread.
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level='INFO', stream=None):
+    # Everything under the 'connect4' logger goes through one queue to a
+    # single writer thread, so logging on a game thread is one put.
+    global listener
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(records, handler)
+    logger = logging.getLogger('connect4')
+    logger.setLevel(level)
+    logger.addHandler(DeferredQueueHandler(records))
+    logger.propagate = False
+    listener.start()
+    return listener
+
+
+def stop_logging():
+    # Drains whatever is still queued.
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
@@ -0,0 +1,158 @@
+import bisect
+import heapq
+import itertools
+import threading
+
+DEFAULT_RATING = 1500
+K_FACTOR = 32
+
+# A queued player first accepts opponents within BASE_WINDOW rating points,
+# and the window grows by WINDOW_STEP every WIDEN_INTERVAL seconds they wait.
+BASE_WINDOW = 100
+WINDOW_STEP = 50
+WIDEN_INTERVAL = 5.0
+MAX_WINDOW = 1000
+TICK_INTERVAL = 0.5
+
+
+class Ticket:
+    def __init__(self, client, name=None, rating=DEFAULT_RATING, spectator=False):
+        self.client = client
+        self.name = name
+        self.rating = rating
+        self.spectator = spectator
+        self.bucket = round(rating)
+        self.enqueued_at = None
+        self.queued = False
+        self.room = None
+        self.player_number = None
+
+
+class MatchmakingQueue:
+    # Waiting tickets are grouped into buckets by rounded rating, and the
+    # ratings that have a non-empty bucket are kept in a sorted list. The
+    # closest opponent is therefore one bisect away no matter how many
+    # players are queued. Window growth is driven by a heap of wake-up times
+    # so a tick only looks at tickets whose window actually grew.
+    def __init__(self):
+        self.buckets = {}
+        self.bucket_keys = []
+        self.widen_heap = []
+        self.counter = itertools.count()
+        self.size = 0
+        self.matches = 0
+        self.total_wait = 0.0
+
+    def __len__(self):
+        return self.size
+
+    def window(self, ticket, now):
+        steps = int((now - ticket.enqueued_at) / WIDEN_INTERVAL)
+        return min(BASE_WINDOW + steps * WINDOW_STEP, MAX_WINDOW)
+
+    def insert(self, ticket):
+        bucket = self.buckets.get(ticket.bucket)
+        if bucket is None:
+            bucket = self.buckets[ticket.bucket] = {}
+            bisect.insort(self.bucket_keys, ticket.bucket)
+        bucket[ticket] = None
+        ticket.queued = True
+        self.size += 1
+
+    def remove(self, ticket):
+        if not ticket.queued:
+            return False
+        bucket = self.buckets[ticket.bucket]
+        del bucket[ticket]
+        if not bucket:
+            del self.buckets[ticket.bucket]
+            del self.bucket_keys[bisect.bisect_left(self.bucket_keys, ticket.bucket)]
+        ticket.queued = False
+        self.size -= 1
+        return True
+
+    def find_match(self, ticket, window):
+        index = bisect.bisect_left(self.bucket_keys, ticket.bucket)
+        candidates = self.bucket_keys[max(0, index - 1):index + 1]
+        if not candidates:
+            return None
+        key = min(candidates, key=lambda key: abs(key - ticket.bucket))
+        if abs(key - ticket.bucket) > window:
+            return None
+        # Oldest ticket first within the closest bucket.
+        return next(iter(self.buckets[key]))
+
+    def pair(self, ticket, opponent, now):
+        self.remove(opponent)
+        self.matches += 1
+        self.total_wait += (now - opponent.enqueued_at) + (now - ticket.enqueued_at)
+        return ticket, opponent
+
+    def enqueue(self, ticket, now):
+        # Returns the pair if the new ticket matched straight away.
+        ticket.enqueued_at = now
+        opponent = self.find_match(ticket, BASE_WINDOW)
+        if opponent is not None:
+            return self.pair(ticket, opponent, now)
+        self.insert(ticket)
+        heapq.heappush(self.widen_heap, (now + WIDEN_INTERVAL, next(self.counter), ticket))
+        return None
+
+    def tick(self, now):
+        pairs = []
+        while self.widen_heap and self.widen_heap[0][0] <= now:
+            _, _, ticket = heapq.heappop(self.widen_heap)
+            if not ticket.queued:
+                continue
+            window = self.window(ticket, now)
+            self.remove(ticket)
+            opponent = self.find_match(ticket, window)
+            if opponent is not None:
+                pairs.append(self.pair(ticket, opponent, now))
+                continue
+            self.insert(ticket)
+            if window < MAX_WINDOW:
+                heapq.heappush(self.widen_heap, (now + WIDEN_INTERVAL, next(self.counter), ticket))
+        return pairs
+
+    def get_stats(self):
+        return {
+            'queued': self.size,
+            'rating_buckets': len(self.bucket_keys),
+            'matches': self.matches,
+            'average_wait': self.total_wait / (2 * self.matches) if self.matches > 0 else 0,
+        }
+
+
+class RatingTable:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ratings = {}
+        self.games = {}
+
+    def get(self, name):
+        with self.lock:
+            return self.ratings.get(name, DEFAULT_RATING)
+
+    def record_result(self, names, winner):
+        # Elo update for one finished game. Unnamed players count as
+        # DEFAULT_RATING and are not stored.
+        if names[0] is None and names[1] is None:
+            return
+        with self.lock:
+            rating_0 = self.ratings.get(names[0], DEFAULT_RATING)
+            rating_1 = self.ratings.get(names[1], DEFAULT_RATING)
+            expected_0 = 1 / (1 + 10 ** ((rating_1 - rating_0) / 400))
+            score_0 = 0.5 if winner is None else 1.0 if winner == 0 else 0.0
+            change = K_FACTOR * (score_0 - expected_0)
+            for name, rating in ((names[0], rating_0 + change), (names[1], rating_1 - change)):
+                if name is not None:
+                    self.ratings[name] = rating
+                    self.games[name] = self.games.get(name, 0) + 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'rated_players': len(self.ratings),
+                'top_rating': max(self.ratings.values()) if self.ratings else DEFAULT_RATING,
+            }
@@ -0,0 +1,124 @@
+import mmap
+import struct
+import time
+from multiprocessing import Pool
+
+from bitboard import Position
+from ai import NegamaxAI
+from transposition import position_key
+
+MAGIC = b'C4BK'
+VERSION = 1
+HEADER = struct.Struct('<4sHBxI')
+RECORD = struct.Struct('<QBi')
+KEY = struct.Struct('<Q')
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.record_count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, position):
+        self.lookups += 1
+        if len(position.moves) > self.plies:
+            return None
+        key = position_key(position)
+        lo, hi = 0, self.record_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, = KEY.unpack_from(self.data, HEADER.size + mid * RECORD.size)
+            if mid_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.record_count:
+            record_key, move, score = RECORD.unpack_from(self.data, HEADER.size + lo * RECORD.size)
+            if record_key == key:
+                self.hits += 1
+                return move, score
+        return None
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def get_stats(self):
+        return {
+            'plies': self.plies,
+            'positions': self.record_count,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups > 0 else 0,
+        }
+
+
+def enumerate_positions(plies):
+    seen = {}
+    stack = [Position()]
+    while stack:
+        position = stack.pop()
+        key = position_key(position)
+        if key in seen:
+            continue
+        seen[key] = list(position.moves)
+        if len(position.moves) >= plies:
+            continue
+        piece = len(position.moves) % 2 + 1
+        for col in position.valid_columns():
+            child = position.copy()
+            row = child.play(col, piece)
+            if not child.winning_cells(row, col):
+                stack.append(child)
+    return seen
+
+
+worker_ai = None
+
+
+def init_worker(depth):
+    global worker_ai
+    worker_ai = NegamaxAI(time_budget_ms=float('inf'), max_depth=depth)
+
+
+def solve_position(args):
+    key, moves = args
+    position = Position()
+    for i, col in enumerate(moves):
+        position.play(col, i % 2 + 1)
+    move, search_info = worker_ai.choose_move(position, len(moves) % 2 + 1)
+    return key, move, search_info['score']
+
+
+def build_book(path, plies, depth, workers=None):
+    positions = enumerate_positions(plies)
+    print(f"Solving {len(positions)} positions up to ply {plies} at depth {depth}")
+    start = time.time()
+    jobs = list(positions.items())
+    with Pool(workers, initializer=init_worker, initargs=(depth,)) as pool:
+        records = sorted(pool.imap_unordered(solve_position, jobs, chunksize=16))
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, plies, len(records)))
+        for key, move, score in records:
+            f.write(RECORD.pack(key, move, score))
+    print(f"Wrote {len(records)} positions to {path} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build a Connect Four opening book')
+    parser.add_argument('--out', default='opening_book.bin', help='Output book file')
+    parser.add_argument('--plies', type=int, default=4, help='Include positions up to this many moves')
+    parser.add_argument('--depth', type=int, default=6, help='Search depth used to score each position')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    build_book(args.out, args.plies, args.depth, args.workers)
@@ -0,0 +1,130 @@
+import signal
+import sys
+import threading
+import time
+
+import numpy as np
+
+RING_SIZE = 4096
+
+
+class StageTimings:
+    # Last RING_SIZE samples for percentiles, plus running totals for the
+    # flame graph. Writers from several threads may occasionally overwrite
+    # each other's slot, which only loses a sample.
+    def __init__(self, size=RING_SIZE):
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.index = 0
+        self.count = 0
+        self.total_ns = 0
+
+    def record(self, elapsed_ns):
+        self.samples[self.index] = elapsed_ns
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+        self.total_ns += elapsed_ns
+
+    def recent(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+
+class Trace:
+    __slots__ = ('profiler', 'path', 'start', 'last')
+
+    def __init__(self, profiler, path):
+        self.profiler = profiler
+        self.path = path
+        self.start = self.last = time.perf_counter_ns()
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self.profiler.record(f"{self.path};{stage}", now - self.last)
+        self.last = now
+
+    def end(self):
+        now = time.perf_counter_ns()
+        self.profiler.record(self.path, now - self.start)
+        stack = self.profiler.local.stack
+        stack.pop()
+        if stack:
+            # This trace is already a child of the parent, so the parent's
+            # next lap starts from here rather than counting it again.
+            stack[-1].last = now
+
+
+class Profiler:
+    # trace() returns None while disabled, so instrumented code pays one
+    # call plus an `if trace` per stage. Traces opened while another is
+    # open on the same thread nest under it, giving folded stack paths
+    # such as process_move;broadcast;encode. Callers end traces in a
+    # finally, so an exception never leaves one open on the thread.
+    def __init__(self, ring_size=RING_SIZE):
+        self.enabled = False
+        self.ring_size = ring_size
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def trace(self, name):
+        if not self.enabled:
+            return None
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        trace = Trace(self, f"{stack[-1].path};{name}" if stack else name)
+        stack.append(trace)
+        return trace
+
+    def record(self, path, elapsed_ns):
+        timings = self.stages.get(path)
+        if timings is None:
+            with self.lock:
+                timings = self.stages.setdefault(path, StageTimings(self.ring_size))
+        timings.record(elapsed_ns)
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+    def folded(self):
+        # Self time per path in microseconds, one "a;b;c value" line each,
+        # ready for flamegraph.pl or speedscope.
+        stages = dict(self.stages)
+        child_totals = {}
+        for path, timings in stages.items():
+            parent = path.rpartition(';')[0]
+            if parent:
+                child_totals[parent] = child_totals.get(parent, 0) + timings.total_ns
+        lines = []
+        for path in sorted(stages):
+            self_ns = stages[path].total_ns - child_totals.get(path, 0)
+            if self_ns > 0:
+                lines.append(f"{path} {self_ns // 1000}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        lines = [f"{'stage':<44} {'count':>9} {'total ms':>10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}"]
+        for path, timings in sorted(dict(self.stages).items()):
+            recent = timings.recent()
+            p50, p99 = np.percentile(recent, (50, 99)) / 1000 if len(recent) else (0, 0)
+            lines.append(f"{path:<44} {timings.count:>9} {timings.total_ns / 1e6:>10.1f} "
+                         f"{timings.total_ns / timings.count / 1000:>9.1f} {p50:>9.1f} {p99:>9.1f}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, out=None):
+        out = out or sys.stdout
+        out.write("\n=== PROFILE ===\n" + self.summary() + "--- folded stacks (us) ---\n" + self.folded())
+        out.flush()
+
+    def install_signal_handler(self, signum=getattr(signal, 'SIGUSR1', None)):
+        if signum is not None:
+            signal.signal(signum, lambda signum, frame: self.dump())
+
+
+PROFILER = Profiler()
@@ -0,0 +1,295 @@
+import io
+import pickle
+import struct
+
+from bitboard import Position, ROW_COUNT, COLUMN_COUNT, COLUMN_HEIGHT, cell_bit
+
+# Every message on the wire is a 4-byte big-endian payload length followed by
+# the payload, so a reader can always tell where one message ends even when
+# several arrive in one recv() or one arrives split across several.
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 1 << 20
+
+# Payloads are self-describing: pickle (protocol 2+) always starts with 0x80,
+# binary payloads start with their format version. Readers accept both, and
+# the join/player_assignment handshake picks what each side sends.
+PICKLE_CODEC = 'pickle'
+BINARY_CODEC = 'binary-v1'
+SUPPORTED_CODECS = (BINARY_CODEC, PICKLE_CODEC)
+PICKLE_MARKER = 0x80
+BINARY_VERSION = 1
+
+MSG_PLAYER_ASSIGNMENT = 1
+MSG_GAME_START = 2
+MSG_GAME_UPDATE = 3
+MSG_PLAYER_DISCONNECTED = 4
+MSG_RESTART_REQUESTED = 5
+MSG_MOVE = 6
+MSG_RESTART_REQUEST = 7
+MSG_JOIN = 8
+MSG_MOVE_DELTA = 9
+MSG_SNAPSHOT = 10
+MSG_RESYNC_REQUEST = 11
+MSG_RESUME = 12
+
+PREFIX = struct.Struct('!BB')
+PLAYER_FIELD = struct.Struct('!B')
+BOARD_FIELDS = struct.Struct('!QQBB')
+GAME_ID_FIELD = struct.Struct('!I')
+RESULT_FIELDS = struct.Struct('!Bb')
+DELTA_FIELDS = struct.Struct('!IBBBBBB')
+SNAPSHOT_FIELDS = struct.Struct('!IIB')
+JOIN_DELTAS = 0x01
+
+RESULT_CODES = {None: 0, 'win': 1, 'draw': 2}
+RESULT_NAMES = {code: name for name, code in RESULT_CODES.items()}
+JOIN_MODES = {None: 0, 'human': 1, 'ai': 2}
+JOIN_MODE_NAMES = {code: name for name, code in JOIN_MODES.items()}
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class RestrictedUnpickler(pickle.Unpickler):
+    # Protocol messages are plain dicts, lists, tuples, numbers and strings,
+    # none of which need a global lookup. Refusing every global keeps a peer
+    # from getting arbitrary callables invoked through pickle.
+    def find_class(self, module, name):
+        raise ProtocolError(f"refusing to unpickle global {module}.{name}")
+
+
+def negotiate_codec(offered):
+    for codec in SUPPORTED_CODECS:
+        if codec in (offered or ()):
+            return codec
+    return PICKLE_CODEC
+
+
+def board_masks(board):
+    if isinstance(board, Position):
+        return board.masks[0], board.masks[1]
+    masks = [0, 0]
+    for r in range(ROW_COUNT):
+        for c in range(COLUMN_COUNT):
+            piece = int(board[r][c])
+            if piece:
+                masks[piece - 1] |= cell_bit(r, c)
+    return masks[0], masks[1]
+
+
+def build_column_table():
+    # Cell values for one column, indexed by (player 1 bits << ROW_COUNT) | player 2 bits.
+    table = []
+    for bits in range(1 << (2 * ROW_COUNT)):
+        bits_1, bits_2 = bits >> ROW_COUNT, bits & ((1 << ROW_COUNT) - 1)
+        table.append(tuple(1 if bits_1 >> r & 1 else 2 if bits_2 >> r & 1 else 0 for r in range(ROW_COUNT)))
+    return table
+
+
+COLUMN_CELLS = build_column_table()
+COLUMN_BITS = (1 << ROW_COUNT) - 1
+
+
+def board_from_masks(mask_1, mask_2):
+    columns = []
+    for c in range(COLUMN_COUNT):
+        shift = c * COLUMN_HEIGHT
+        columns.append(COLUMN_CELLS[((mask_1 >> shift & COLUMN_BITS) << ROW_COUNT) | (mask_2 >> shift & COLUMN_BITS)])
+    return [list(row) for row in zip(*columns)]
+
+
+def pack_board(message):
+    mask_1, mask_2 = board_masks(message['board'])
+    return BOARD_FIELDS.pack(mask_1, mask_2, message['turn'], message['game_over'])
+
+
+def unpack_board(payload, offset, message):
+    mask_1, mask_2, turn, game_over = BOARD_FIELDS.unpack_from(payload, offset)
+    message['board'] = board_from_masks(mask_1, mask_2)
+    message['turn'] = turn
+    message['game_over'] = bool(game_over)
+    return offset + BOARD_FIELDS.size
+
+
+def pack_result(message):
+    winner = message.get('winner')
+    cells = message.get('winning_cells') or []
+    return (RESULT_FIELDS.pack(RESULT_CODES[message.get('result')], -1 if winner is None else winner)
+            + bytes([len(cells)]) + bytes((r << 4) | c for r, c in cells))
+
+
+def unpack_result(payload, offset, message):
+    result, winner = RESULT_FIELDS.unpack_from(payload, offset)
+    offset += RESULT_FIELDS.size
+    count = payload[offset]
+    cells = payload[offset + 1:offset + 1 + count]
+    message['result'] = RESULT_NAMES[result]
+    message['winner'] = None if winner < 0 else winner
+    message['winning_cells'] = [(cell >> 4, cell & 0xF) for cell in cells]
+    return offset + 1 + count
+
+
+def encode_binary(message):
+    kind = message['type']
+    if kind == 'player_assignment':
+        session = bytes.fromhex(message['session']) if message.get('session') else b''
+        return PREFIX.pack(BINARY_VERSION, MSG_PLAYER_ASSIGNMENT) + PLAYER_FIELD.pack(message['player']) + session
+    if kind == 'game_start':
+        return (PREFIX.pack(BINARY_VERSION, MSG_GAME_START) + pack_board(message)
+                + GAME_ID_FIELD.pack(message['game_id']))
+    if kind == 'game_update':
+        return PREFIX.pack(BINARY_VERSION, MSG_GAME_UPDATE) + pack_board(message) + pack_result(message)
+    if kind == 'move_delta':
+        return (PREFIX.pack(BINARY_VERSION, MSG_MOVE_DELTA)
+                + DELTA_FIELDS.pack(message['seq'], message['move_number'], message['player'],
+                                    message['column'], message['row'], message['turn'], message['game_over'])
+                + pack_result(message))
+    if kind == 'snapshot':
+        return (PREFIX.pack(BINARY_VERSION, MSG_SNAPSHOT) + pack_board(message)
+                + SNAPSHOT_FIELDS.pack(message['game_id'], message['seq'], message['move_number'])
+                + pack_result(message))
+    if kind == 'resume':
+        return (PREFIX.pack(BINARY_VERSION, MSG_RESUME) + pack_board(message)
+                + SNAPSHOT_FIELDS.pack(message['game_id'], message['seq'], message['move_number'])
+                + pack_result(message) + bytes(message['move_history']))
+    if kind == 'resync_request':
+        return PREFIX.pack(BINARY_VERSION, MSG_RESYNC_REQUEST)
+    if kind == 'player_disconnected':
+        return PREFIX.pack(BINARY_VERSION, MSG_PLAYER_DISCONNECTED) + PLAYER_FIELD.pack(message['player'])
+    if kind == 'restart_requested':
+        waiting = sum(1 << i for i, flag in enumerate(message['waiting_restart']) if flag)
+        return PREFIX.pack(BINARY_VERSION, MSG_RESTART_REQUESTED) + bytes([message['player'], waiting])
+    if kind == 'move':
+        return PREFIX.pack(BINARY_VERSION, MSG_MOVE) + bytes([message['column']])
+    if kind == 'restart_request':
+        return PREFIX.pack(BINARY_VERSION, MSG_RESTART_REQUEST)
+    if kind == 'join':
+        if any(key in message for key in ('name', 'role', 'room', 'session')):
+            return None
+        flags = JOIN_DELTAS if message.get('deltas') else 0
+        return PREFIX.pack(BINARY_VERSION, MSG_JOIN) + bytes([JOIN_MODES[message.get('mode')], flags])
+    return None
+
+
+def decode_binary(payload):
+    version, kind = PREFIX.unpack_from(payload, 0)
+    if version != BINARY_VERSION:
+        raise ProtocolError(f"unsupported binary message version {version}")
+    offset = PREFIX.size
+    if kind == MSG_PLAYER_ASSIGNMENT:
+        message = {'type': 'player_assignment', 'player': payload[offset], 'codec': BINARY_CODEC}
+        if len(payload) > offset + 1:
+            message['session'] = payload[offset + 1:].hex()
+        return message
+    if kind == MSG_GAME_START:
+        message = {'type': 'game_start'}
+        offset = unpack_board(payload, offset, message)
+        message['game_id'], = GAME_ID_FIELD.unpack_from(payload, offset)
+        return message
+    if kind == MSG_GAME_UPDATE:
+        message = {'type': 'game_update'}
+        offset = unpack_board(payload, offset, message)
+        unpack_result(payload, offset, message)
+        return message
+    if kind == MSG_MOVE_DELTA:
+        seq, move_number, player, column, row, turn, game_over = DELTA_FIELDS.unpack_from(payload, offset)
+        message = {'type': 'move_delta', 'seq': seq, 'move_number': move_number, 'player': player,
+                   'column': column, 'row': row, 'turn': turn, 'game_over': bool(game_over)}
+        unpack_result(payload, offset + DELTA_FIELDS.size, message)
+        return message
+    if kind == MSG_SNAPSHOT:
+        message = {'type': 'snapshot'}
+        offset = unpack_board(payload, offset, message)
+        message['game_id'], message['seq'], message['move_number'] = SNAPSHOT_FIELDS.unpack_from(payload, offset)
+        unpack_result(payload, offset + SNAPSHOT_FIELDS.size, message)
+        return message
+    if kind == MSG_RESUME:
+        message = {'type': 'resume'}
+        offset = unpack_board(payload, offset, message)
+        message['game_id'], message['seq'], message['move_number'] = SNAPSHOT_FIELDS.unpack_from(payload, offset)
+        offset = unpack_result(payload, offset + SNAPSHOT_FIELDS.size, message)
+        message['move_history'] = list(payload[offset:])
+        return message
+    if kind == MSG_RESYNC_REQUEST:
+        return {'type': 'resync_request'}
+    if kind == MSG_PLAYER_DISCONNECTED:
+        return {'type': 'player_disconnected', 'player': payload[offset]}
+    if kind == MSG_RESTART_REQUESTED:
+        waiting = payload[offset + 1]
+        return {'type': 'restart_requested', 'player': payload[offset],
+                'waiting_restart': [bool(waiting & 1), bool(waiting & 2)]}
+    if kind == MSG_MOVE:
+        return {'type': 'move', 'column': payload[offset]}
+    if kind == MSG_RESTART_REQUEST:
+        return {'type': 'restart_request'}
+    if kind == MSG_JOIN:
+        message = {'type': 'join', 'codecs': [BINARY_CODEC]}
+        mode = JOIN_MODE_NAMES[payload[offset]]
+        if mode is not None:
+            message['mode'] = mode
+        if len(payload) > offset + 1 and payload[offset + 1] & JOIN_DELTAS:
+            message['deltas'] = True
+        return message
+    raise ProtocolError(f"unknown binary message type {kind}")
+
+
+def encode_frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+
+def encode_payload(message, codec=PICKLE_CODEC):
+    # Message types without a binary layout fall back to pickle, which every
+    # reader understands.
+    if codec == BINARY_CODEC:
+        payload = encode_binary(message)
+        if payload is not None:
+            return payload
+    if isinstance(message.get('board'), Position):
+        message = dict(message, board=message['board'].tolist())
+    return pickle.dumps(message)
+
+
+def encode_message(message, codec=PICKLE_CODEC):
+    return encode_frame(encode_payload(message, codec))
+
+
+def decode_message(payload):
+    if not payload:
+        raise ProtocolError("empty message")
+    if payload[0] == PICKLE_MARKER:
+        return RestrictedUnpickler(io.BytesIO(payload)).load()
+    return decode_binary(payload)
+
+
+class FrameReader:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        offset = 0
+        while len(self.buffer) - offset >= HEADER.size:
+            length, = HEADER.unpack_from(self.buffer, offset)
+            if length > MAX_FRAME_SIZE:
+                raise ProtocolError(f"frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+            end = offset + HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            frames.append(bytes(self.buffer[offset + HEADER.size:end]))
+            offset = end
+        if offset:
+            del self.buffer[:offset]
+        return frames
+
+    def messages(self, data):
+        return [decode_message(payload) for payload in self.feed(data)]
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(HEADER.size)
+    length, = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return await reader.readexactly(length)
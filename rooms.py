@@ -0,0 +1,645 @@
+import heapq
+import itertools
+import logging
+import secrets
+import threading
+import time
+
+from bitboard import Position, COLUMN_COUNT
+from heuristics import AIHeuristics
+from protocol import encode_message
+from matchmaking import MatchmakingQueue
+from metrics import REGISTRY
+from profiling import PROFILER
+
+log = logging.getLogger('connect4.rooms')
+
+# Seconds a dropped player's seat is held for them to resume with their
+# session token before the game is ended.
+RECONNECT_GRACE = 30
+
+MOVES = REGISTRY.counter('connect4_moves_total', 'Moves applied across all rooms')
+GAMES_STARTED = REGISTRY.counter('connect4_games_started_total', 'Games started across all rooms')
+MOVE_LATENCY = REGISTRY.histogram('connect4_move_processing_seconds',
+                                  'Time to apply a move and queue its broadcast')
+BROADCAST_LATENCY = REGISTRY.histogram('connect4_broadcast_seconds',
+                                       'Time from encoding a broadcast to handing it to every subscriber')
+AI_SEARCH_TIME = REGISTRY.histogram('connect4_ai_search_seconds', 'AI search time per move',
+                                    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+
+
+class PositionEvaluation:
+    # Runs the heuristic only when the log listener formats the record, so
+    # evaluation logging never happens on the move path.
+    def __init__(self, board, piece):
+        self.board = board
+        self.piece = piece
+
+    def __str__(self):
+        current_score = AIHeuristics.evaluate_position(self.board, self.piece)
+        opponent_score = AIHeuristics.evaluate_position(self.board, self.piece % 2 + 1)
+        return f"Position evaluation - Player {self.piece}: {current_score}, Opponent: {opponent_score}"
+
+
+class GameSummary:
+    # Formatted by the log listener.
+    def __init__(self, game_id, duration, winner, move_history):
+        self.game_id = game_id
+        self.duration = duration
+        self.winner = winner
+        self.move_history = move_history
+
+    def __str__(self):
+        total_moves = len(self.move_history)
+        move_freq = {}
+        for move in self.move_history:
+            col = move['column']
+            move_freq[col] = move_freq.get(col, 0) + 1
+        lines = [
+            f"=== GAME {self.game_id} SUMMARY ===",
+            f"Duration: {self.duration:.1f} seconds",
+            f"Total moves: {total_moves}",
+            f"Average time per move: {self.duration / total_moves:.2f}s",
+            f"Winner: Player {self.winner + 1}" if self.winner is not None else "Result: Draw",
+            f"Column usage: {({f'Col {k}': v for k, v in sorted(move_freq.items())})}",
+        ]
+        return '\n'.join(lines)
+
+
+class GameRoom:
+    def __init__(self, room_id, analytics, game_ids, ai=None, opening_book=None, ratings=None, game_log=None,
+                 log_evaluations=False):
+        self.room_id = room_id
+        self.lock = threading.RLock()
+        self.analytics = analytics
+        self.game_ids = game_ids
+        self.clients = [None, None]
+        self.names = [None, None]
+        self.sessions = [None, None]
+        self.away_deadlines = [None, None]
+        self.spectators = []
+        self.board = Position()
+        self.turn = 0
+        self.game_over = False
+        self.game_id = 0
+        self.waiting_restart = [False, False]
+        self.move_history = []
+        self.game_start_time = None
+        self.result = None
+        self.winner = None
+        self.winning_cells = []
+        self.seq = 0
+        self.ai = ai
+        self.ai_player = 1 if ai is not None else None
+        # Set while the asyncio server has a search for this room running in
+        # the executor, so concurrent frames never start a second one.
+        self.ai_searching = False
+        self.opening_book = opening_book
+        self.ratings = ratings
+        self.game_log = game_log
+        self.log_evaluations = log_evaluations
+        self.closed = False
+        self.outbox = {}
+        self.outbox_started = None
+
+    def human_seats(self):
+        return 1 if self.ai_player is not None else 2
+
+    def connected_players(self):
+        return sum(1 for client in self.clients if client is not None)
+
+    def is_full(self):
+        return self.connected_players() == self.human_seats()
+
+    def add_player(self, client, name=None):
+        # The seat assignment is sent under the room lock so it always reaches
+        # the client before any game message broadcast by the other seat.
+        with self.lock:
+            player_number = self.clients.index(None)
+            self.clients[player_number] = client
+            self.names[player_number] = name
+            self.sessions[player_number] = secrets.token_hex(16)
+            self.seat(player_number, client)
+            return player_number
+
+    def seat(self, player_number, client):
+        client.resync_source = lambda: self.resync_frame(client)
+        assignment = {
+            'type': 'player_assignment',
+            'player': player_number,
+            'codec': client.codec,
+            'session': self.sessions[player_number]
+        }
+        client.sendall(encode_message(assignment, client.codec))
+
+    def suspend_player(self, player_number, deadline):
+        # Keeps the seat and the game going while the player reconnects.
+        with self.lock:
+            self.clients[player_number] = None
+            self.away_deadlines[player_number] = deadline
+            self.broadcast({'type': 'player_away', 'player': player_number})
+            self.flush()
+
+    def resume_player(self, player_number, client):
+        with self.lock:
+            if self.closed:
+                return False
+            stale = self.clients[player_number]
+            if stale is not None:
+                # The old connection died without the server noticing yet
+                # (nothing has failed to write to it). The token holder takes
+                # the seat over and the old connection is dropped.
+                log.info("Room %d: player %d reconnected over a stale connection",
+                         self.room_id, player_number + 1)
+                stale.abort()
+            else:
+                self.broadcast({'type': 'player_returned', 'player': player_number})
+                self.flush()
+            self.clients[player_number] = client
+            self.away_deadlines[player_number] = None
+            self.seat(player_number, client)
+            client.sendall(encode_message(self.resume_message(), client.codec))
+            return True
+
+    def is_seated(self, player_number, client):
+        return self.clients[player_number] is client
+
+    def taken_over(self, player_number, client):
+        # A seat emptied by a failed write is not taken over; it still has
+        # to be suspended or closed when its connection leaves.
+        current = self.clients[player_number]
+        return current is not None and current is not client
+
+    def add_spectator(self, client):
+        with self.lock:
+            self.spectators.append(client)
+            client.resync_source = lambda: self.resync_frame(client)
+            assignment = {'type': 'spectator_assignment', 'room': self.room_id, 'codec': client.codec}
+            client.sendall(encode_message(assignment, client.codec))
+            client.sendall(self.resync_frame(client))
+
+    def remove_spectator(self, client):
+        with self.lock:
+            if client in self.spectators:
+                self.spectators.remove(client)
+
+    def handle_spectator_message(self, client, message):
+        with self.lock:
+            if message['type'] == 'resync_request':
+                client.sendall(self.resync_frame(client))
+
+    def remove_player(self, player_number):
+        with self.lock:
+            self.clients[player_number] = None
+            self.away_deadlines[player_number] = None
+            self.closed = True
+            if not self.game_over:
+                self.game_over = True
+                if self.move_history:
+                    self.archive_game('abandoned', None)
+                game_state = {
+                    'type': 'player_disconnected',
+                    'player': player_number
+                }
+                self.broadcast(game_state)
+            self.flush()
+
+    def start_game(self):
+        with self.lock:
+            self.board = Position()
+            self.turn = 0
+            self.game_over = False
+            self.game_id = next(self.game_ids)
+            self.waiting_restart = [False, False]
+            # Replaced rather than cleared: the log listener and the game log
+            # writer still read the finished game's list after the room moves on.
+            self.move_history = []
+            self.game_start_time = time.time()
+            self.result = None
+            self.winner = None
+            self.winning_cells = []
+            self.seq += 1
+            self.analytics.record_game_start()
+            GAMES_STARTED.inc()
+
+            log.info("Room %d: starting game #%d", self.room_id, self.game_id)
+
+            game_state = {
+                'type': 'game_start',
+                'board': self.board,
+                'turn': self.turn,
+                'game_over': self.game_over,
+                'game_id': self.game_id
+            }
+            self.broadcast(game_state, self.snapshot_message())
+            self.flush()
+
+    def handle_message(self, player_number, message):
+        with self.lock:
+            if self.closed:
+                return
+
+            if message['type'] == 'move':
+                if not self.game_over and self.turn == player_number:
+                    col = message['column']
+                    self.process_move(player_number, col)
+
+            elif message['type'] == 'restart_request':
+                self.waiting_restart[player_number] = True
+                if self.ai_player is not None:
+                    self.waiting_restart[self.ai_player] = True
+                log.info("Room %d: player %d requested restart", self.room_id, player_number + 1)
+
+                if all(self.waiting_restart):
+                    log.info("Room %d: both players agreed to restart", self.room_id)
+                    self.start_game()
+                else:
+                    restart_msg = {
+                        'type': 'restart_requested',
+                        'player': player_number,
+                        'waiting_restart': self.waiting_restart
+                    }
+                    self.broadcast(restart_msg)
+
+            elif message['type'] == 'resync_request':
+                self.flush()
+                client = self.clients[player_number]
+                if client is not None:
+                    client.sendall(self.resync_frame(client))
+            self.flush()
+
+    def process_move(self, player, col):
+        if 0 <= col < COLUMN_COUNT and self.is_valid_location(col):
+            started = time.perf_counter()
+            trace = PROFILER.trace('process_move')
+            try:
+                row = self.get_next_open_row(col)
+                self.drop_piece(row, col, player + 1)
+                self.move_history.append({
+                    'player': player,
+                    'column': col,
+                    'row': row,
+                    'timestamp': time.time() - self.game_start_time
+                })
+                if trace:
+                    trace.lap('drop')
+
+                winning_cells = self.board.winning_cells(row, col)
+                self.seq += 1
+                if winning_cells:
+                    self.game_over = True
+                    result = 'win'
+                    winner = player
+                elif self.is_board_full():
+                    self.game_over = True
+                    result = 'draw'
+                    winner = None
+                else:
+                    result = None
+                    winner = None
+                    self.turn = (self.turn + 1) % 2
+                self.result, self.winner, self.winning_cells = result, winner, winning_cells
+                if trace:
+                    trace.lap('win_check')
+
+                game_state = {
+                    'type': 'game_update',
+                    'board': self.board,
+                    'turn': self.turn,
+                    'game_over': self.game_over,
+                    'result': result,
+                    'winner': winner,
+                    'winning_cells': winning_cells
+                }
+                move_delta = {
+                    'type': 'move_delta',
+                    'seq': self.seq,
+                    'move_number': len(self.board.moves),
+                    'player': player,
+                    'column': col,
+                    'row': row,
+                    'turn': self.turn,
+                    'game_over': self.game_over,
+                    'result': result,
+                    'winner': winner,
+                    'winning_cells': winning_cells
+                }
+                self.broadcast(game_state, move_delta)
+                self.flush()
+                MOVE_LATENCY.observe(time.perf_counter() - started)
+
+                # Everything below is bookkeeping and diagnostics, done once the
+                # update is already queued for the players.
+                MOVES.inc()
+                self.analytics.record_move(player, col)
+                log.debug("Game %d: player %d played column %d", self.game_id, player + 1, col)
+                if self.log_evaluations and log.isEnabledFor(logging.DEBUG):
+                    log.debug("Game %d: %s", self.game_id, PositionEvaluation(self.board.copy(), player + 1))
+                if result is not None:
+                    self.finish_game(result, winner)
+                if trace:
+                    trace.lap('bookkeeping')
+            finally:
+                if trace:
+                    trace.end()
+
+    def finish_game(self, result, winner):
+        self.analytics.record_game_end(winner, time.time() - self.game_start_time, self.move_history)
+        self.record_rating(winner)
+        if winner is not None:
+            log.info("Game %d ended - Player %d wins!", self.game_id, winner + 1)
+        else:
+            log.info("Game %d ended in a draw!", self.game_id)
+        self.log_game_summary(winner)
+        self.archive_game(result, winner)
+
+    def record_rating(self, winner):
+        if self.ratings is not None:
+            self.ratings.record_result(self.names, winner)
+
+    def ai_to_move(self):
+        return self.ai is not None and not self.game_over and self.turn == self.ai_player
+
+    def choose_ai_move(self, board):
+        trace = PROFILER.trace('ai_move')
+        try:
+            book_move = self.opening_book.lookup(board) if self.opening_book else None
+            if trace:
+                trace.lap('book')
+            if book_move is not None and board.can_play(book_move[0]):
+                log.debug("Game %d: AI played book move %d", self.game_id, book_move[0])
+                return book_move[0]
+            col, search_info = self.ai.choose_move(board, self.ai_player + 1)
+            if trace:
+                trace.lap('search')
+        finally:
+            if trace:
+                trace.end()
+        self.analytics.record_ai_move(search_info)
+        AI_SEARCH_TIME.observe(search_info['elapsed_ms'] / 1000)
+        log.debug("Game %d: AI searched depth %d, %d nodes in %.0fms (%.0f nodes/s)", self.game_id,
+                  search_info['depth'], search_info['nodes'], search_info['elapsed_ms'], search_info['nodes_per_sec'])
+        return col
+
+    def play_ai_turn(self):
+        with self.lock:
+            if self.ai_to_move():
+                self.process_move(self.ai_player, self.choose_ai_move(self.board))
+            self.flush()
+
+    def log_game_summary(self, winner):
+        log.info("%s", GameSummary(self.game_id, time.time() - self.game_start_time, winner, self.move_history))
+
+    def archive_game(self, result, winner):
+        if self.game_log is not None:
+            self.game_log.append(self.game_id, self.game_start_time, result, winner, self.move_history)
+
+    def snapshot_message(self):
+        return {
+            'type': 'snapshot',
+            'game_id': self.game_id,
+            'seq': self.seq,
+            'move_number': len(self.board.moves),
+            'board': self.board,
+            'turn': self.turn,
+            'game_over': self.game_over,
+            'result': self.result,
+            'winner': self.winner,
+            'winning_cells': self.winning_cells
+        }
+
+    def resume_message(self):
+        # Everything a returning client needs to redraw the game as it
+        # stands, without animating moves it already saw.
+        return dict(self.snapshot_message(), type='resume',
+                    move_history=[move['column'] for move in self.move_history])
+
+    def resync_message(self, deltas):
+        if deltas:
+            return self.snapshot_message()
+        return {
+            'type': 'game_update',
+            'board': self.board,
+            'turn': self.turn,
+            'game_over': self.game_over,
+            'result': self.result,
+            'winner': self.winner,
+            'winning_cells': self.winning_cells
+        }
+
+    def status_messages(self):
+        # Restart and away state the snapshot does not carry. A dropped
+        # backlog may have held the originals, so they follow every resync.
+        messages = []
+        if any(self.waiting_restart):
+            messages.append({
+                'type': 'restart_requested',
+                'player': self.waiting_restart.index(True),
+                'waiting_restart': self.waiting_restart
+            })
+        for player_number, deadline in enumerate(self.away_deadlines):
+            if deadline is not None:
+                messages.append({'type': 'player_away', 'player': player_number})
+        return messages
+
+    def resync_frame(self, client):
+        # Used for resync requests and by send queues that dropped a backlog.
+        with self.lock:
+            messages = [self.resync_message(client.deltas)] + self.status_messages()
+            return b''.join(encode_message(message, client.codec) for message in messages)
+
+    def subscribers(self):
+        return [client for client in self.clients if client is not None] + self.spectators
+
+    def broadcast(self, message, delta_message=None):
+        # Encoded once per wire format in use in this room, not per player or
+        # spectator. Clients that negotiated deltas get delta_message when
+        # there is one.
+        if not self.outbox:
+            self.outbox_started = time.perf_counter()
+        trace = PROFILER.trace('broadcast')
+        try:
+            variants = {(client.codec, client.deltas) for client in self.subscribers()}
+            for codec, deltas in variants:
+                outgoing = delta_message if deltas and delta_message is not None else message
+                self.outbox.setdefault((codec, deltas), []).append(encode_message(outgoing, codec))
+            if trace:
+                trace.lap('encode')
+        finally:
+            if trace:
+                trace.end()
+
+    def flush(self):
+        # Messages queued while handling one event are joined into one shared
+        # buffer per variant and handed to each subscriber's send queue.
+        if not self.outbox:
+            return
+        trace = PROFILER.trace('flush')
+        try:
+            batches = {variant: b''.join(frames) for variant, frames in self.outbox.items()}
+            self.outbox.clear()
+            if trace:
+                trace.lap('join')
+
+            for player_number, client in enumerate(self.clients):
+                variant = (client.codec, client.deltas) if client is not None else None
+                if variant not in batches:
+                    continue
+                try:
+                    client.sendall(batches[variant])
+                except OSError:
+                    self.clients[player_number] = None
+
+            for client in list(self.spectators):
+                variant = (client.codec, client.deltas)
+                if variant not in batches:
+                    continue
+                try:
+                    client.sendall(batches[variant])
+                except OSError:
+                    self.spectators.remove(client)
+            if trace:
+                trace.lap('enqueue')
+        finally:
+            if trace:
+                trace.end()
+        BROADCAST_LATENCY.observe(time.perf_counter() - self.outbox_started)
+
+    def drop_piece(self, row, col, piece):
+        self.board.play(col, piece)
+
+    def is_valid_location(self, col):
+        return self.board.can_play(col)
+
+    def get_next_open_row(self, col):
+        return self.board.next_open_row(col)
+
+    def winning_move(self, piece):
+        return self.board.is_win(piece)
+
+    def is_board_full(self):
+        return self.board.is_full()
+
+
+class RoomManager:
+    def __init__(self, analytics, ai_factory=None, opening_book=None, ratings=None,
+                 reconnect_grace=RECONNECT_GRACE, game_log=None, log_evaluations=False):
+        self.analytics = analytics
+        self.ai_factory = ai_factory
+        self.opening_book = opening_book
+        self.ratings = ratings
+        self.game_log = game_log
+        self.log_evaluations = log_evaluations
+        self.lock = threading.Lock()
+        self.rooms = {}
+        self.matchmaking = MatchmakingQueue()
+        self.reconnect_grace = reconnect_grace
+        self.sessions = {}
+        self.away = []
+        self.away_ids = itertools.count()
+        self.room_ids = itertools.count(1)
+        self.game_ids = itertools.count(1)
+
+    def create_room(self, ai=None):
+        room = GameRoom(next(self.room_ids), self.analytics, self.game_ids,
+                        ai=ai, opening_book=self.opening_book if ai is not None else None,
+                        ratings=self.ratings if ai is None else None, game_log=self.game_log,
+                        log_evaluations=self.log_evaluations)
+        self.rooms[room.room_id] = room
+        return room
+
+    def join(self, ticket, mode='human'):
+        # AI games start straight away. Everyone else waits in the
+        # matchmaking queue; ticket.room is set once they are paired.
+        with self.lock:
+            if mode == 'ai' and self.ai_factory is not None:
+                self.start_match(self.create_room(ai=self.ai_factory()), [ticket])
+            else:
+                pair = self.matchmaking.enqueue(ticket, time.time())
+                if pair is not None:
+                    self.start_match(self.create_room(), pair)
+
+    def tick(self):
+        now = time.time()
+        with self.lock:
+            for pair in self.matchmaking.tick(now):
+                self.start_match(self.create_room(), pair)
+            while self.away and self.away[0][0] <= now:
+                deadline, _, room, player_number = heapq.heappop(self.away)
+                # A seat that was resumed, or dropped again since, has a
+                # different deadline and is left alone.
+                if room.away_deadlines[player_number] == deadline:
+                    log.info("Room %d: player %d did not reconnect in time", room.room_id, player_number + 1)
+                    self.close_seat(room, player_number)
+
+    def start_match(self, room, tickets):
+        # The player who waited longest moves first.
+        for ticket in sorted(tickets, key=lambda ticket: ticket.enqueued_at or 0):
+            ticket.player_number = room.add_player(ticket.client, ticket.name)
+            ticket.room = room
+            self.sessions[room.sessions[ticket.player_number]] = (room, ticket.player_number)
+        if len(tickets) == 2:
+            log.info("Room %d: matched ratings %.0f and %.0f", room.room_id, tickets[0].rating, tickets[1].rating)
+        room.start_game()
+
+    def leave(self, ticket):
+        with self.lock:
+            room = ticket.room
+            if room is None:
+                self.matchmaking.remove(ticket)
+                return
+            if ticket.spectator:
+                room.remove_spectator(ticket.client)
+                return
+            if room.taken_over(ticket.player_number, ticket.client):
+                # The seat was taken over by a resumed connection.
+                return
+            if room.closed:
+                self.close_seat(room, ticket.player_number)
+                return
+            deadline = time.time() + self.reconnect_grace
+            room.suspend_player(ticket.player_number, deadline)
+            heapq.heappush(self.away, (deadline, next(self.away_ids), room, ticket.player_number))
+
+    def close_seat(self, room, player_number):
+        room.remove_player(player_number)
+        if room.connected_players() == 0:
+            self.rooms.pop(room.room_id, None)
+            for session in room.sessions:
+                self.sessions.pop(session, None)
+
+    def resume(self, ticket, session):
+        with self.lock:
+            room, player_number = self.sessions.get(session, (None, None))
+            if room is None or not room.resume_player(player_number, ticket.client):
+                return None
+            ticket.room, ticket.player_number = room, player_number
+            ticket.name = room.names[player_number]
+            return room
+
+    def spectate(self, ticket, room_id=None):
+        with self.lock:
+            if room_id is not None:
+                room = self.rooms.get(room_id)
+            else:
+                live = [room for room in self.rooms.values() if room.game_id and not room.closed]
+                room = max(live, key=lambda room: room.room_id) if live else None
+            if room is not None:
+                room.add_spectator(ticket.client)
+                ticket.room = room
+            return room
+
+    def get_stats(self):
+        with self.lock:
+            rooms = list(self.rooms.values())
+            matchmaking = self.matchmaking.get_stats()
+        return {
+            'rooms': len(rooms),
+            'spectators': sum(len(room.spectators) for room in rooms),
+            'games_in_progress': sum(1 for room in rooms if room.game_id and not room.game_over),
+            'players_waiting': matchmaking['queued'],
+            'players_away': sum(1 for room in rooms for deadline in room.away_deadlines if deadline is not None),
+            'rating_buckets': matchmaking['rating_buckets'],
+            'matches': matchmaking['matches'],
+            'average_wait': matchmaking['average_wait'],
+        }
@@ -6,8 +6,21 @@ import numpy as np
 import sys
 import time
 import json
+import logging
 from datetime import datetime
 from pygame.locals import *
+from ai import NegamaxAI
+from transposition import TranspositionTable
+from opening_book import OpeningBook
+from rooms import RoomManager, RECONNECT_GRACE
+from game_log import GameLogWriter
+from matchmaking import Ticket, RatingTable, TICK_INTERVAL
+from protocol import FrameReader, encode_message, negotiate_codec
+from connections import Connection, CONNECTED_SOCKETS, BYTES_IN
+from metrics import REGISTRY, start_metrics_server
+from profiling import PROFILER
+from logs import setup_logging, stop_logging
+from stats import RunningStats, QuantileSketch, TopK
 
 ROW_COUNT = 6
 COLUMN_COUNT = 7
@@ -22,390 +35,296 @@ YELLOW = (255, 255, 0)
 WHITE = (255, 255, 255)
 GREEN = (0, 255, 0)
 GRAY = (128, 128, 128)
+log = logging.getLogger('connect4.server')
+
+OPENING_PLIES = 4
+OPENING_CAPACITY = 64
 
 class GameAnalytics:
+    # Every statistic here is a fixed-size accumulator, so memory use and
+    # the cost of get_stats stay flat however long the server runs.
     def __init__(self):
         self.games_played = 0
         self.total_moves = 0
-        self.game_durations = []
+        self.game_durations = RunningStats()
+        self.duration_quantiles = QuantileSketch()
         self.wins_by_player = [0, 0]
         self.draws = 0
-        self.move_patterns = {}
+        self.move_counts = np.zeros((2, COLUMN_COUNT), dtype=np.int64)
+        self.openings = TopK(OPENING_CAPACITY)
         self.session_start = time.time()
+        self.ai_moves = 0
+        self.ai_nodes = 0
+        self.ai_search_time = 0
+        self.ai_depth_total = 0
+        self.ai_max_depth = 0
+        self.stat_sources = {}
+        self.lock = threading.Lock()
+        
+    def add_stat_source(self, name, source):
+        self.stat_sources[name] = source
         
     def record_game_start(self):
-        self.games_played += 1
-        self.game_start_time = time.time()
+        with self.lock:
+            self.games_played += 1
+            self.game_start_time = time.time()
         
     def record_move(self, player, column):
-        self.total_moves += 1
-        move_key = f"player_{player}_col_{column}"
-        self.move_patterns[move_key] = self.move_patterns.get(move_key, 0) + 1
-        
-    def record_game_end(self, winner):
-        game_duration = time.time() - self.game_start_time
-        self.game_durations.append(game_duration)
-        
-        if winner is not None:
-            self.wins_by_player[winner] += 1
-        else:
-            self.draws += 1
-    
-    def get_stats(self):
-        avg_duration = sum(self.game_durations) / len(self.game_durations) if self.game_durations else 0
-        avg_moves_per_game = self.total_moves / self.games_played if self.games_played > 0 else 0
-        session_duration = time.time() - self.session_start
-        
-        return {
-            'games_played': self.games_played,
-            'total_moves': self.total_moves,
-            'avg_game_duration': avg_duration,
-            'avg_moves_per_game': avg_moves_per_game,
-            'wins_player_1': self.wins_by_player[0],
-            'wins_player_2': self.wins_by_player[1],
-            'draws': self.draws,
-            'session_duration': session_duration,
-            'most_popular_moves': self.get_popular_moves()
-        }
+        with self.lock:
+            self.total_moves += 1
+            self.move_counts[player, column] += 1
+        
+    def record_game_end(self, winner, game_duration=None, move_history=None):
+        with self.lock:
+            if game_duration is None:
+                game_duration = time.time() - self.game_start_time
+            self.game_durations.add(game_duration)
+            self.duration_quantiles.add(game_duration)
+            if move_history:
+                self.openings.add(''.join(str(move['column']) for move in move_history[:OPENING_PLIES]))
+            
+            if winner is not None:
+                self.wins_by_player[winner] += 1
+            else:
+                self.draws += 1
     
-    def get_popular_moves(self):
-        if not self.move_patterns:
-            return {}
-        sorted_moves = sorted(self.move_patterns.items(), key=lambda x: x[1], reverse=True)
-        return dict(sorted_moves[:5])  
+    def record_ai_move(self, search_info):
+        with self.lock:
+            self.ai_moves += 1
+            self.ai_nodes += search_info['nodes']
+            self.ai_search_time += search_info['elapsed_ms'] / 1000
+            self.ai_depth_total += search_info['depth']
+            self.ai_max_depth = max(self.ai_max_depth, search_info['depth'])
 
-class AIHeuristics:
-    
-    @staticmethod
-    def evaluate_position(board, piece):
-        score = 0
-        
-        
-        center_count = sum(1 for r in range(ROW_COUNT) if board[r][COLUMN_COUNT//2] == piece)
-        score += center_count * 3
-        
-        
-        score += AIHeuristics.evaluate_window_sequences(board, piece, horizontal=True)
-        
-        
-        score += AIHeuristics.evaluate_window_sequences(board, piece, vertical=True)
-        
-        
-        score += AIHeuristics.evaluate_window_sequences(board, piece, diagonal=True)
-        
-        return score
-    
-    @staticmethod
-    def evaluate_window_sequences(board, piece, horizontal=False, vertical=False, diagonal=False):
-        score = 0
-        
-        if horizontal:
-            for r in range(ROW_COUNT):
-                for c in range(COLUMN_COUNT - 3):
-                    window = [board[r][c+i] for i in range(4)]
-                    score += AIHeuristics.score_window(window, piece)
-        
-        if vertical:
-            for c in range(COLUMN_COUNT):
-                for r in range(ROW_COUNT - 3):
-                    window = [board[r+i][c] for i in range(4)]
-                    score += AIHeuristics.score_window(window, piece)
-        
-        if diagonal:
-            
-            for r in range(ROW_COUNT - 3):
-                for c in range(COLUMN_COUNT - 3):
-                    window = [board[r+i][c+i] for i in range(4)]
-                    score += AIHeuristics.score_window(window, piece)
-            
+    def get_stats(self):
+        with self.lock:
+            avg_moves_per_game = self.total_moves / self.games_played if self.games_played > 0 else 0
+            session_duration = time.time() - self.session_start
+            quantiles = self.duration_quantiles.quantiles((0.5, 0.9, 0.99))
             
-            for r in range(3, ROW_COUNT):
-                for c in range(COLUMN_COUNT - 3):
-                    window = [board[r-i][c+i] for i in range(4)]
-                    score += AIHeuristics.score_window(window, piece)
-        
-        return score
+            stats = {
+                'games_played': self.games_played,
+                'total_moves': self.total_moves,
+                'avg_game_duration': self.game_durations.mean,
+                'game_duration_stddev': self.game_durations.stddev(),
+                'game_duration_p50': quantiles[0.5],
+                'game_duration_p90': quantiles[0.9],
+                'game_duration_p99': quantiles[0.99],
+                'avg_moves_per_game': avg_moves_per_game,
+                'wins_player_1': self.wins_by_player[0],
+                'wins_player_2': self.wins_by_player[1],
+                'draws': self.draws,
+                'session_duration': session_duration,
+                'most_popular_moves': self.get_popular_moves(),
+                'most_popular_openings': dict(self.openings.top(5)),
+                'ai_moves': self.ai_moves,
+                'ai_nodes_per_sec': self.ai_nodes / self.ai_search_time if self.ai_search_time > 0 else 0,
+                'ai_avg_depth': self.ai_depth_total / self.ai_moves if self.ai_moves > 0 else 0,
+                'ai_max_depth': self.ai_max_depth
+            }
+        for name, source in self.stat_sources.items():
+            stats[name] = source.get_stats()
+        return stats
     
-    @staticmethod
-    def score_window(window, piece):
-        score = 0
-        opponent_piece = 2 if piece == 1 else 1
-        
-        piece_count = window.count(piece)
-        empty_count = window.count(0)
-        opponent_count = window.count(opponent_piece)
-        
-        if piece_count == 4:
-            score += 100
-        elif piece_count == 3 and empty_count == 1:
-            score += 10
-        elif piece_count == 2 and empty_count == 2:
-            score += 2
-        
-        if opponent_count == 3 and empty_count == 1:
-            score -= 80  
-        
-        return score
+    def get_popular_moves(self):
+        # Top five of the fixed 2 x COLUMN_COUNT count table.
+        flat = self.move_counts.ravel()
+        top = [i for i in np.argsort(flat)[::-1][:5] if flat[i] > 0]
+        return {f"player_{i // COLUMN_COUNT}_col_{i % COLUMN_COUNT}": int(flat[i]) for i in top}
 
 class ConnectFourServer:
-    def __init__(self, host='localhost', port=5555):
+    def __init__(self, host='localhost', port=5555, ai_opponent=False, ai_time_ms=500, tt_size_mb=16,
+                 book_path=None, reconnect_grace=RECONNECT_GRACE, game_log_path=None,
+                 metrics_port=None, profile=False, log_evaluations=False):
+        self.analytics = GameAnalytics()
+        self.default_mode = 'ai' if ai_opponent else 'human'
+        self.ai_time_ms = ai_time_ms
+        self.transposition_table = TranspositionTable(tt_size_mb)
+        self.analytics.add_stat_source('transposition_table', self.transposition_table)
+        self.opening_book = OpeningBook(book_path) if book_path else None
+        if self.opening_book is not None:
+            self.analytics.add_stat_source('opening_book', self.opening_book)
+            print(f"Loaded opening book with {self.opening_book.record_count} positions")
+        self.game_log = GameLogWriter(game_log_path) if game_log_path else None
+        if self.game_log is not None:
+            self.analytics.add_stat_source('game_log', self.game_log)
+        self.ratings = RatingTable()
+        self.analytics.add_stat_source('ratings', self.ratings)
+        self.rooms = RoomManager(self.analytics, ai_factory=self.create_ai, opening_book=self.opening_book,
+                                 ratings=self.ratings, reconnect_grace=reconnect_grace, game_log=self.game_log,
+                                 log_evaluations=log_evaluations)
+        self.analytics.add_stat_source('rooms', self.rooms)
+        REGISTRY.gauge('connect4_games_in_progress', 'Games currently being played',
+                       lambda: self.rooms.get_stats()['games_in_progress'])
+        REGISTRY.gauge('connect4_players_waiting', 'Players waiting in the matchmaking queue',
+                       lambda: len(self.rooms.matchmaking))
+        if profile:
+            PROFILER.enable()
+            PROFILER.install_signal_handler()
+            print("Profiling enabled: send SIGUSR1 to print stage timings")
+        self.metrics_port = metrics_port
+        if metrics_port is not None:
+            start_metrics_server(host, metrics_port, pages={'/profile': PROFILER.summary,
+                                                            '/profile/folded': PROFILER.folded})
+        
+        self.start(host, port)
+        
+    def start(self, host, port):
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server.bind((host, port))
-        self.server.listen(2)
+        self.server.listen(128)
         print(f"Enhanced Server started, listening on {host}:{port}")
         
-        self.clients = []
-        self.board = np.zeros((ROW_COUNT, COLUMN_COUNT))
-        self.turn = 0
-        self.game_over = False
-        self.game_id = 0
-        self.waiting_restart = [False, False]
-        self.analytics = GameAnalytics()
-        self.move_history = []
-        self.game_start_time = None
-        
         threading.Thread(target=self.accept_connections).start()
-        threading.Thread(target=self.analytics_loop).start()
+        if self.metrics_port is None:
+            threading.Thread(target=self.analytics_loop).start()
+        threading.Thread(target=self.matchmaking_loop, daemon=True).start()
+        
+    def shutdown(self):
+        if self.game_log is not None:
+            self.game_log.close()
+        stop_logging()
+        
+    def create_ai(self):
+        return NegamaxAI(time_budget_ms=self.ai_time_ms, transposition_table=self.transposition_table)
+        
+    def join_mode(self, message):
+        if message.get('type') != 'join':
+            return self.default_mode
+        return message.get('mode', self.default_mode)
+        
+    def attach(self, client, join):
+        if join.get('role') == 'spectator':
+            ticket = Ticket(client, spectator=True)
+            room = self.rooms.spectate(ticket, join.get('room'))
+            if room is None:
+                client.sendall(encode_message({'type': 'error', 'reason': 'no game to spectate'}, client.codec))
+                return None
+            log.info("Spectator joined room %d", room.room_id)
+            return ticket
+        
+        if join.get('session'):
+            ticket = Ticket(client)
+            room = self.rooms.resume(ticket, join['session'])
+            if room is None:
+                client.sendall(encode_message({'type': 'error', 'reason': 'session expired'}, client.codec))
+                return None
+            log.info("Player %d resumed in room %d", ticket.player_number + 1, room.room_id)
+            return ticket
+        
+        name = join.get('name')
+        ticket = Ticket(client, name, self.ratings.get(name))
+        self.rooms.join(ticket, self.join_mode(join))
+        if ticket.room is None:
+            log.info("Player %s queued with rating %.0f", name or 'anonymous', ticket.rating)
+        else:
+            log.info("Player %d joined room %d", ticket.player_number + 1, ticket.room.room_id)
+        return ticket
+        
+    def route(self, ticket, message):
+        # Messages from players still waiting in the queue are ignored.
+        if ticket.room is None:
+            return
+        if ticket.spectator:
+            ticket.room.handle_spectator_message(ticket.client, message)
+        elif ticket.room.is_seated(ticket.player_number, ticket.client):
+            ticket.room.handle_message(ticket.player_number, message)
+        
+    def detach(self, ticket):
+        self.rooms.leave(ticket)
+        if ticket.room is None:
+            log.info("Player %s left the matchmaking queue", ticket.name or 'anonymous')
+        elif ticket.spectator:
+            log.info("Spectator left room %d", ticket.room.room_id)
+        else:
+            log.info("Client %d left room %d", ticket.player_number, ticket.room.room_id)
+        
+    def matchmaking_loop(self):
+        while True:
+            time.sleep(TICK_INTERVAL)
+            self.rooms.tick()
         
     def analytics_loop(self):
         while True:
             time.sleep(30)  
-            if self.analytics.games_played > 0:
-                stats = self.analytics.get_stats()
-                print("\n=== SERVER ANALYTICS ===")
-                print(f"Games played: {stats['games_played']}")
-                print(f"Total moves: {stats['total_moves']}")
-                print(f"Average game duration: {stats['avg_game_duration']:.1f}s")
-                print(f"Player 1 wins: {stats['wins_player_1']}")
-                print(f"Player 2 wins: {stats['wins_player_2']}")
-                print(f"Draws: {stats['draws']}")
-                print(f"Session uptime: {stats['session_duration']:.1f}s")
-                if stats['most_popular_moves']:
-                    print("Popular moves:", stats['most_popular_moves'])
-                print("========================\n")
-        
+            self.print_analytics()
+            
+    def print_analytics(self):
+        if self.analytics.games_played > 0:
+            stats = self.analytics.get_stats()
+            print("\n=== SERVER ANALYTICS ===")
+            print(f"Games played: {stats['games_played']}")
+            print(f"Total moves: {stats['total_moves']}")
+            print(f"Average game duration: {stats['avg_game_duration']:.1f}s "
+                  f"(p50 {stats['game_duration_p50']:.1f}s, p90 {stats['game_duration_p90']:.1f}s, "
+                  f"p99 {stats['game_duration_p99']:.1f}s)")
+            print(f"Player 1 wins: {stats['wins_player_1']}")
+            print(f"Player 2 wins: {stats['wins_player_2']}")
+            print(f"Draws: {stats['draws']}")
+            print(f"Session uptime: {stats['session_duration']:.1f}s")
+            print(f"Games in progress: {stats['rooms']['games_in_progress']} in {stats['rooms']['rooms']} rooms")
+            if stats['most_popular_moves']:
+                print("Popular moves:", stats['most_popular_moves'])
+            if stats['most_popular_openings']:
+                print("Popular openings:", stats['most_popular_openings'])
+            if stats['ai_moves']:
+                print(f"AI search: {stats['ai_nodes_per_sec']:.0f} nodes/s, "
+                      f"avg depth {stats['ai_avg_depth']:.1f}, max depth {stats['ai_max_depth']}")
+                tt_stats = stats['transposition_table']
+                print(f"Transposition table: {tt_stats['hit_rate']:.1%} hits, {tt_stats['fill']:.1%} full")
+            if 'opening_book' in stats:
+                print(f"Opening book: {stats['opening_book']['hit_rate']:.1%} hits")
+            print("========================\n")
+    
     def accept_connections(self):
-        while len(self.clients) < 2:
+        while True:
             client_socket, addr = self.server.accept()
-            print(f"Connected with {addr}")
-            
-            player_number = len(self.clients)
-            client_socket.send(str(player_number).encode())
-            
-            self.clients.append(client_socket)
-            
-            threading.Thread(target=self.handle_client, args=(client_socket, player_number)).start()
-            
-            if len(self.clients) == 2:
-                self.start_game()
+            log.debug("Connected with %s", addr)
+            threading.Thread(target=self.handle_client, args=(client_socket,), daemon=True).start()
                 
-    def start_game(self):
-        self.board = np.zeros((ROW_COUNT, COLUMN_COUNT))
-        self.turn = 0
-        self.game_over = False
-        self.game_id += 1
-        self.waiting_restart = [False, False]
-        self.move_history = []
-        self.game_start_time = time.time()
-        self.analytics.record_game_start()
-        
-        print(f"Starting game #{self.game_id}")
-        
-        game_state = {
-            'type': 'game_start',
-            'board': self.board.tolist(),
-            'turn': self.turn,
-            'game_over': self.game_over,
-            'game_id': self.game_id
-        }
-        self.broadcast(game_state)
-        
-    def handle_client(self, client_socket, player_number):
-        while True:
-            try:
+    def handle_client(self, client_socket):
+        CONNECTED_SOCKETS.inc()
+        reader = FrameReader()
+        pending = []
+        client, ticket = None, None
+        try:
+            while not pending:
                 data = client_socket.recv(4096)
+                BYTES_IN.inc(len(data))
                 if not data:
                     break
+                pending = reader.messages(data)
+            if pending:
+                join = pending.pop(0)
+                client = Connection(client_socket, negotiate_codec(join.get('codecs')), bool(join.get('deltas')))
+                ticket = self.attach(client, join)
+        except Exception as e:
+            log.warning("Error joining client: %s", e)
+        
+        while ticket is not None:
+            try:
+                for message in pending:
+                    self.route(ticket, message)
+                    if ticket.room is not None:
+                        ticket.room.play_ai_turn()
                 
-                message = pickle.loads(data)
-                
-                if message['type'] == 'move':
-                    if not self.game_over and self.turn == player_number:
-                        col = message['column']
-                        self.process_move(player_number, col)
-                
-                elif message['type'] == 'restart_request':
-                    self.waiting_restart[player_number] = True
-                    print(f"Player {player_number + 1} requested restart")
-                    
-                    if all(self.waiting_restart):
-                        print("Both players agreed to restart")
-                        self.start_game()
-                    else:
-                        restart_msg = {
-                            'type': 'restart_requested',
-                            'player': player_number,
-                            'waiting_restart': self.waiting_restart
-                        }
-                        self.broadcast(restart_msg)
+                data = client_socket.recv(4096)
+                BYTES_IN.inc(len(data))
+                if not data:
+                    break
+                pending = reader.messages(data)
                 
             except Exception as e:
-                print(f"Error handling client {player_number}: {e}")
+                log.warning("Error handling client %s: %s", ticket.player_number, e)
                 break
         
-        if client_socket in self.clients:
-            self.clients.remove(client_socket)
-            
+        if ticket is not None:
+            self.detach(ticket)
+        if client is not None:
+            client.close()
         client_socket.close()
-        print(f"Client {player_number} disconnected")
-        
-        if len(self.clients) < 2 and not self.game_over:
-            self.game_over = True
-            game_state = {
-                'type': 'player_disconnected',
-                'player': player_number
-            }
-            self.broadcast(game_state)
-    
-    def process_move(self, player, col):
-        if 0 <= col < COLUMN_COUNT and self.is_valid_location(col):
-            row = self.get_next_open_row(col)
-            self.drop_piece(row, col, player + 1)
-            
-            
-            self.analytics.record_move(player, col)
-            self.move_history.append({
-                'player': player,
-                'column': col,
-                'row': row,
-                'timestamp': time.time() - self.game_start_time
-            })
-            
-            print(f"Player {player + 1} played column {col}")
-            
-            
-            current_score = AIHeuristics.evaluate_position(self.board, player + 1)
-            opponent_score = AIHeuristics.evaluate_position(self.board, (player + 1) % 2 + 1)
-            
-            print(f"Position evaluation - Player {player + 1}: {current_score}, Opponent: {opponent_score}")
-            
-            if self.winning_move(player + 1):
-                self.game_over = True
-                result = 'win'
-                winner = player
-                self.analytics.record_game_end(winner)
-                print(f"Game {self.game_id} ended - Player {player + 1} wins!")
-                self.log_game_summary(winner)
-            elif self.is_board_full():
-                self.game_over = True
-                result = 'draw'
-                winner = None
-                self.analytics.record_game_end(None)
-                print(f"Game {self.game_id} ended in a draw!")
-                self.log_game_summary(None)
-            else:
-                result = None
-                winner = None
-                self.turn = (self.turn + 1) % 2
-            
-            game_state = {
-                'type': 'game_update',
-                'board': self.board.tolist(),
-                'turn': self.turn,
-                'game_over': self.game_over,
-                'result': result,
-                'winner': winner
-            }
-            self.broadcast(game_state)
-    
-    def log_game_summary(self, winner):
-        game_duration = time.time() - self.game_start_time
-        total_moves = len(self.move_history)
-        
-        print(f"\n=== GAME {self.game_id} SUMMARY ===")
-        print(f"Duration: {game_duration:.1f} seconds")
-        print(f"Total moves: {total_moves}")
-        print(f"Average time per move: {game_duration/total_moves:.2f}s")
-        
-        if winner is not None:
-            print(f"Winner: Player {winner + 1}")
-        else:
-            print("Result: Draw")
-        
-        
-        move_freq = {}
-        for move in self.move_history:
-            col = move['column']
-            move_freq[col] = move_freq.get(col, 0) + 1
-        
-        print("Column usage:", {f"Col {k}": v for k, v in sorted(move_freq.items())})
-        print("===============================\n")
-    
-    def broadcast(self, message):
-        data = pickle.dumps(message)
-        disconnected_clients = []
-        
-        for client in self.clients:
-            try:
-                client.send(data)
-            except:
-                disconnected_clients.append(client)
-        
-        
-        for client in disconnected_clients:
-            if client in self.clients:
-                self.clients.remove(client)
-    
-    def create_board(self):
-        return np.zeros((ROW_COUNT, COLUMN_COUNT))
-
-    def drop_piece(self, row, col, piece):
-        self.board[row][col] = piece
-
-    def is_valid_location(self, col):
-        return self.board[ROW_COUNT-1][col] == 0
-
-    def get_next_open_row(self, col):
-        for r in range(ROW_COUNT):
-            if self.board[r][col] == 0:
-                return r
-
-    def winning_move(self, piece):
-        
-        for c in range(COLUMN_COUNT-3):
-            for r in range(ROW_COUNT):
-                if (self.board[r][c] == piece and self.board[r][c+1] == piece and 
-                    self.board[r][c+2] == piece and self.board[r][c+3] == piece):
-                    return True
-
-        
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT-3):
-                if (self.board[r][c] == piece and self.board[r+1][c] == piece and 
-                    self.board[r+2][c] == piece and self.board[r+3][c] == piece):
-                    return True
-
-        
-        for c in range(COLUMN_COUNT-3):
-            for r in range(ROW_COUNT-3):
-                if (self.board[r][c] == piece and self.board[r+1][c+1] == piece and 
-                    self.board[r+2][c+2] == piece and self.board[r+3][c+3] == piece):
-                    return True
-
-        
-        for c in range(COLUMN_COUNT-3):
-            for r in range(3, ROW_COUNT):
-                if (self.board[r][c] == piece and self.board[r-1][c+1] == piece and 
-                    self.board[r-2][c+2] == piece and self.board[r-3][c+3] == piece):
-                    return True
-
-        return False
-
-    def is_board_full(self):
-        for col in range(COLUMN_COUNT):
-            if self.is_valid_location(col):
-                return False
-        return True
+        CONNECTED_SOCKETS.dec()
 
 if __name__ == "__main__":
     import argparse
@@ -413,13 +332,45 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Enhanced Connect Four Server')
     parser.add_argument('--host', default='localhost', help='Server host address')
     parser.add_argument('--port', type=int, default=5555, help='Server port')
+    parser.add_argument('--ai', action='store_true', help='Play against a server-side AI opponent')
+    parser.add_argument('--ai-time-ms', type=int, default=500, help='AI search budget per move in milliseconds')
+    parser.add_argument('--tt-mb', type=float, default=16, help='AI transposition table size in MB')
+    parser.add_argument('--book', default=None, help='Opening book built with opening_book.py')
+    parser.add_argument('--reconnect-grace', type=float, default=RECONNECT_GRACE,
+                        help='Seconds a dropped player has to resume their game')
+    parser.add_argument('--game-log', default=None, help='Append every finished game to this binary log')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics over HTTP on this port instead of printing analytics')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record per-stage timings of the move path (dump with SIGUSR1)')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Server log level (DEBUG logs every move)')
+    parser.add_argument('--log-evaluations', action='store_true',
+                        help='Log heuristic evaluations of every position (needs --log-level DEBUG)')
+    parser.add_argument('--asyncio', action='store_true', help='Serve all connections from one asyncio event loop')
     args = parser.parse_args()
+    setup_logging(args.log_level)
+    
+    options = dict(host=args.host, port=args.port, ai_opponent=args.ai, ai_time_ms=args.ai_time_ms,
+                   tt_size_mb=args.tt_mb, book_path=args.book, reconnect_grace=args.reconnect_grace,
+                   game_log_path=args.game_log, metrics_port=args.metrics_port,
+                   profile=args.profile, log_evaluations=args.log_evaluations)
+    if args.asyncio:
+        from async_server import AsyncConnectFourServer
+        server = AsyncConnectFourServer(**options)
+        try:
+            server.run()
+        except KeyboardInterrupt:
+            print("\nServer shutting down...")
+        server.shutdown()
+        sys.exit()
     
-    server = ConnectFourServer(host=args.host, port=args.port)
+    server = ConnectFourServer(**options)
     try:
         print("Server running... Press Ctrl+C to stop")
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         print("\nServer shutting down...")
+        server.shutdown()
         sys.exit()
\ No newline at end of file
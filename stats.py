@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+
+
+class RunningStats:
+    # Welford's online mean and variance.
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def stddev(self):
+        return math.sqrt(self.variance())
+
+
+class QuantileSketch:
+    # Fixed array of log-spaced buckets between min_value and max_value.
+    # Quantiles come back within relative_error of the true value (values
+    # outside the range are clamped to it), and memory and query cost
+    # depend only on the bucket count, never on how many values were added.
+    def __init__(self, min_value=0.01, max_value=100000, relative_error=0.01):
+        self.min_value = min_value
+        self.log_gamma = math.log((1 + relative_error) / (1 - relative_error))
+        self.bucket_count = int(math.ceil(math.log(max_value / min_value) / self.log_gamma)) + 1
+        self.counts = np.zeros(self.bucket_count, dtype=np.int64)
+        self.total = 0
+
+    def add(self, value):
+        index = 0
+        if value > self.min_value:
+            index = min(int(math.log(value / self.min_value) / self.log_gamma), self.bucket_count - 1)
+        self.counts[index] += 1
+        self.total += 1
+
+    def quantile(self, q):
+        if self.total == 0:
+            return 0.0
+        rank = q * (self.total - 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank, side='right'))
+        # Geometric midpoint of the bucket.
+        return self.min_value * math.exp((min(index, self.bucket_count - 1) + 0.5) * self.log_gamma)
+
+    def merge(self, other):
+        # Both sketches must have been built with the same parameters.
+        self.counts += other.counts
+        self.total += other.total
+
+    def quantiles(self, qs):
+        return {q: self.quantile(q) for q in qs}
+
+
+class TopK:
+    # Space-Saving heavy hitters: at most capacity counters. Keys that are
+    # really among the top k are kept with counts overestimated by at most
+    # the smallest tracked count.
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, key, count=1):
+        if key in self.counts or len(self.counts) < self.capacity:
+            self.counts[key] = self.counts.get(key, 0) + count
+            return
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[key] = self.counts.pop(smallest) + count
+
+    def top(self, k):
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
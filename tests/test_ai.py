@@ -0,0 +1,57 @@
+import random
+
+from ai import NegamaxAI
+from bitboard import Position
+from transposition import TranspositionTable
+
+
+class ReferenceAI(NegamaxAI):
+    # Scores depth-1 children one negamax(child, 0) call at a time.
+    def evaluate_children(self, position, valid, piece):
+        best = None
+        for col in valid:
+            position.play(col, piece)
+            score = -self.negamax(position, 0, -float('inf'), float('inf'), 3 - piece)
+            position.undo()
+            best = score if best is None else max(best, score)
+        return best
+
+
+def position_from(moves):
+    position = Position()
+    for i, col in enumerate(moves):
+        position.play(col, i % 2 + 1)
+    return position
+
+
+def search(ai_class, position, depth):
+    ai = ai_class(time_budget_ms=float('inf'), transposition_table=TranspositionTable(size_mb=1))
+    ai.transposition_table.new_search()
+    ai.deadline = float('inf')
+    piece = len(position.moves) % 2 + 1
+    return ai.search_root(position, piece, depth, 3)
+
+
+def test_batched_leaves_see_immediate_losses():
+    position = position_from([0, 5, 3, 5, 6, 0, 3, 5, 5, 1, 1, 2, 5, 5, 1, 4, 0, 0])
+    assert search(NegamaxAI, position, 4) == search(ReferenceAI, position, 4)
+
+
+def test_batched_leaves_match_reference():
+    rng = random.Random(4)
+    for _ in range(40):
+        position = Position()
+        piece = 1
+        for _ in range(rng.randrange(4, 24)):
+            valid = position.valid_columns()
+            if not valid:
+                break
+            position.play(rng.choice(valid), piece)
+            if position.is_win(piece):
+                position.undo()
+                break
+            piece = 3 - piece
+        if not position.valid_columns():
+            continue
+        for depth in (2, 3):
+            assert search(NegamaxAI, position, depth)[1] == search(ReferenceAI, position, depth)[1]
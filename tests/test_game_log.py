@@ -0,0 +1,24 @@
+from game_log import GameLogWriter, encode_record, read_games
+
+
+def history(count):
+    return [{'player': i % 2, 'column': i % 7, 'timestamp': i * 0.5} for i in range(count)]
+
+
+def test_writer_cuts_off_torn_record(tmp_path):
+    path = str(tmp_path / 'games.log')
+    writer = GameLogWriter(path)
+    writer.append(1, 1.0, 'win', 0, history(7))
+    writer.close()
+    torn = encode_record(2, 2.0, 'draw', None, history(42))
+    with open(path, 'ab') as f:
+        f.write(torn[:len(torn) // 2])
+
+    writer = GameLogWriter(path)
+    assert writer.get_stats()['truncated_bytes'] == len(torn) // 2
+    writer.append(3, 3.0, 'win', 1, history(9))
+    writer.close()
+
+    games = list(read_games(path))
+    assert [game['game_id'] for game in games] == [1, 3]
+    assert len(games[1]['move_history']) == 9
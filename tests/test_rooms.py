@@ -0,0 +1,72 @@
+from matchmaking import Ticket
+from protocol import FrameReader, PICKLE_CODEC
+from rooms import RoomManager
+from server import GameAnalytics
+
+
+class RecordingClient:
+    def __init__(self):
+        self.codec = PICKLE_CODEC
+        self.deltas = False
+        self.resync_source = None
+        self.reader = FrameReader()
+        self.messages = []
+        self.broken = False
+        self.aborted = False
+
+    def sendall(self, data):
+        if self.broken:
+            raise OSError("connection reset")
+        self.messages += self.reader.messages(data)
+
+    def abort(self):
+        self.aborted = True
+
+    def types(self):
+        return [message['type'] for message in self.messages]
+
+
+def start_human_game():
+    rooms = RoomManager(GameAnalytics())
+    tickets = [Ticket(RecordingClient()), Ticket(RecordingClient())]
+    for ticket in tickets:
+        rooms.join(ticket)
+    first = min(tickets, key=lambda ticket: ticket.player_number)
+    return rooms, first.room, sorted(tickets, key=lambda ticket: ticket.player_number)
+
+
+def test_leave_after_failed_write_suspends_seat():
+    rooms, room, (first, second) = start_human_game()
+    second.client.broken = True
+    room.process_move(0, 3)
+    assert room.clients[1] is None
+
+    rooms.leave(second)
+    assert room.away_deadlines[1] is not None
+    assert 'player_away' in first.client.types()
+
+
+def test_leave_after_takeover_keeps_new_connection():
+    rooms, room, (first, second) = start_human_game()
+    session = room.sessions[1]
+    resumed = Ticket(RecordingClient())
+    assert rooms.resume(resumed, session) is room
+    assert second.client.aborted
+
+    rooms.leave(second)
+    assert room.clients[1] is resumed.client
+    assert room.away_deadlines[1] is None
+    assert 'player_away' not in first.client.types()
+
+
+def test_resync_carries_restart_and_away_status():
+    rooms, room, (first, second) = start_human_game()
+    room.handle_message(0, {'type': 'restart_request'})
+    second.client.broken = True
+    room.process_move(0, 3)
+    rooms.leave(second)
+
+    messages = first.client.reader.messages(room.resync_frame(first.client))
+    assert [message['type'] for message in messages] == ['game_update', 'restart_requested', 'player_away']
+    assert messages[1]['waiting_restart'] == [True, False]
+    assert messages[2]['player'] == 1
@@ -0,0 +1,52 @@
+import itertools
+
+from ai import NegamaxAI
+from bitboard import Position
+from transposition import TranspositionTable, position_key, EXACT
+
+
+def opening_keys(plies):
+    keys = set()
+    for moves in itertools.product(range(7), repeat=plies):
+        position = Position()
+        for i, col in enumerate(moves):
+            position.play(col, i % 2 + 1)
+        keys.add(position_key(position))
+    return sorted(keys)
+
+
+def test_power_of_two_table_spreads_keys():
+    # 4096 slots. Indexing by the raw key would only look at its low
+    # 12 bits, which cover the first two columns.
+    table = TranspositionTable(size_mb=4096 * 16 / (1024 * 1024))
+    assert table.slot_count == 4096
+    keys = opening_keys(4)
+    for key in keys:
+        table.store(key, 0, 1, EXACT)
+    assert table.fill() * table.slot_count > 0.75 * len(keys)
+
+    hits = sum(table.probe(key) is not None for key in keys)
+    assert hits > 0.75 * len(keys)
+
+
+def test_concurrent_searches_keep_their_own_deeper_entries():
+    table = TranspositionTable(size_mb=1)
+    key = position_key(Position())
+    first = table.new_search()
+    table.store(key, 10, 8, EXACT, generation=first)
+    table.new_search()
+    # A shallower result from the first search still running.
+    table.store(key, 20, 2, EXACT, generation=first)
+    assert table.probe(key)[:2] == (10, 8)
+
+
+def test_search_uses_table():
+    table = TranspositionTable(size_mb=1)
+    ai = NegamaxAI(time_budget_ms=float('inf'), max_depth=6, transposition_table=table)
+    position = Position()
+    for i, col in enumerate([3, 3, 2, 4]):
+        position.play(col, i % 2 + 1)
+    ai.choose_move(position, 1)
+    stats = table.get_stats()
+    assert stats['hits'] > 0
+    assert stats['fill'] > 0
@@ -0,0 +1,108 @@
+import numpy as np
+
+from bitboard import BOTTOM_MASK
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+NO_MOVE = 15
+
+# Each slot is two uint64 words: the packed entry and key ^ entry. A reader
+# only trusts a slot if the two words XOR back to its own key, so entries
+# torn by concurrent writers from other game threads are simply misses.
+SLOT_BYTES = 16
+SCORE_OFFSET = 1 << 31
+MASK64 = (1 << 64) - 1
+# Fibonacci hashing: position keys differ mostly in their low bits (the
+# first columns), so the key is multiplied out and its high bits pick
+# the slot.
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+GENERATIONS = 255
+# Occupancy is counted over this many leading slots. Slots are picked by
+# the hash, so they fill evenly and the sample tracks the whole table.
+FILL_SAMPLE = 1 << 16
+
+
+def position_key(position):
+    # Unique per position: the sentinel bit above each column's top piece
+    # marks its height, the bits below it mark player 1's pieces.
+    masks = position.masks
+    return masks[0] + (masks[0] | masks[1]) + BOTTOM_MASK
+
+
+def pack_entry(score, depth, flag, move, generation):
+    return ((score + SCORE_OFFSET)
+            | (depth << 32)
+            | (flag << 40)
+            | (move << 42)
+            | (generation << 46))
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.slot_count = max(1, int(size_mb * 1024 * 1024) // SLOT_BYTES)
+        self.entries = np.zeros(self.slot_count, dtype=np.uint64)
+        self.checks = np.zeros(self.slot_count, dtype=np.uint64)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        # Each search stores with its own generation, so concurrent searches
+        # sharing the table keep their own deeper entries and only treat
+        # each other's (and older searches') entries as replaceable.
+        self.generation = self.generation % GENERATIONS + 1
+        return self.generation
+
+    def slot(self, key):
+        return (((key * HASH_MULTIPLIER) & MASK64) * self.slot_count) >> 64
+
+    def clear(self):
+        self.entries.fill(0)
+        self.checks.fill(0)
+
+    def probe(self, key):
+        self.probes += 1
+        slot = self.slot(key)
+        entry = int(self.entries[slot])
+        if entry == 0 or int(self.checks[slot]) ^ entry != key:
+            return None
+        self.hits += 1
+        return (
+            (entry & 0xFFFFFFFF) - SCORE_OFFSET,
+            (entry >> 32) & 0xFF,
+            (entry >> 40) & 0x3,
+            (entry >> 42) & 0xF,
+        )
+
+    def store(self, key, score, depth, flag, move=NO_MOVE, generation=None):
+        if generation is None:
+            generation = self.generation
+        slot = self.slot(key)
+        current = int(self.entries[slot])
+        if current != 0 and ((current >> 46) & 0xFF) == generation and ((current >> 32) & 0xFF) > depth:
+            # Depth-preferred: keep a deeper result from the same search.
+            return
+        entry = pack_entry(score, depth, flag, move, generation)
+        self.entries[slot] = entry
+        self.checks[slot] = key ^ entry
+        self.stores += 1
+
+    def fill(self):
+        # Sampled from the table itself rather than counted in store(),
+        # where concurrent game threads would race on the counter.
+        sample = self.entries[:FILL_SAMPLE]
+        return np.count_nonzero(sample) / len(sample)
+
+    def get_stats(self):
+        return {
+            'size_mb': self.size_mb,
+            'slots': self.slot_count,
+            'fill': self.fill(),
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes > 0 else 0,
+            'stores': self.stores,
+        }